@@ -23,6 +23,7 @@ setup(name="orbit_defender2d",
         "networkx",
         "matplotlib",
         "pyzmq",
+        "orjson",
         "tornado==6.1",
         "pygame==2.0.3",
         "bidict",
@@ -14,20 +14,17 @@ import orbit_defender2d.utils.utils as U
 MAX_RING = 5
 MIN_RING = 1
 GEO_RING = 4
-if MIN_RING == 1:
-    NUM_SPACES = 2**(MAX_RING + 1) -2**(MIN_RING) #Get the number of spaces in the board (not including the center)
-elif MIN_RING > 1:
-    NUM_SPACES = 2**(MAX_RING + 1) -2**(MIN_RING - 1) #Get the number of spaces in the board (not including the center)
-else:
+if MIN_RING < 1:
     raise ValueError("MIN_RING must be >= 1")
+NUM_SPACES = (1 << (MAX_RING + 1)) - (1 << max(MIN_RING - 1, 1)) #Get the number of spaces in the board (not including the center)
 
 ########### initial token placement and attributes ############
-INIT_BOARD_PATTERN_P1 = [(-2,2), (-1,2), (0,2), (1,2), (2,2)] # (relative azim, number of pieces)
-INIT_BOARD_PATTERN_P2 = [(-2,2), (-1,2), (0,2), (1,2), (2,2)] # (relative azim, number of pieces)
+INIT_BOARD_PATTERN_P1 = ((-2,2), (-1,2), (0,2), (1,2), (2,2)) # (relative azim, number of pieces)
+INIT_BOARD_PATTERN_P2 = ((-2,2), (-1,2), (0,2), (1,2), (2,2)) # (relative azim, number of pieces)
 
 NUM_TOKENS_PER_PLAYER = {
-    U.P1: sum([a[1] for a in INIT_BOARD_PATTERN_P1])+1, #Get the number of tokens per player, plus 1 for the seeker
-    U.P2: sum([a[1] for a in INIT_BOARD_PATTERN_P2])+1 #Get the number of tokens per player, plus 1 for the seeker
+    U.P1: sum(a[1] for a in INIT_BOARD_PATTERN_P1)+1, #Get the number of tokens per player, plus 1 for the seeker
+    U.P2: sum(a[1] for a in INIT_BOARD_PATTERN_P2)+1 #Get the number of tokens per player, plus 1 for the seeker
     }
 
 INIT_FUEL = {
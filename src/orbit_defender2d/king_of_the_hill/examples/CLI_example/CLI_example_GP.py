@@ -2,153 +2,28 @@
 # Subject to FAR 52.227-11 – Patent Rights – Ownership by the Contractor (May 2014).
 # SPDX-License-Identifier: MIT
 
-# Default Game Parameters 
-# used for default KOTHGame instantiation
+# Game Parameters for the CLI example
+# used for KOTHGame instantiation in playerCLI_vs_AI.py
 #
-# If using or training an AI, pettingzoo_env.py will use the values in this file to set the observation and action space sizes. Some values are hardcoded in pettingzoo_env.py. Use caution.
-
+# Only the board size and initial token placement differ from default_game_parameters.py, 
+# all other parameters are shared with (not copied from) the defaults.
+# The trained AI's observation and action space sizes depend on the values in this file. Use caution.
 
 import orbit_defender2d.utils.utils as U
+from orbit_defender2d.king_of_the_hill.default_game_parameters import (
+    MIN_RING, GEO_RING, INIT_FUEL, INIT_AMMO, MIN_FUEL, FUEL_USAGE, ENGAGE_PROBS, 
+    IN_GOAL_POINTS, ADJ_GOAL_POINTS, FUEL_POINTS_FACTOR, FUEL_POINTS_FACTOR_BLUDGER, 
+    WIN_SCORE, ILLEGAL_ACT_SCORE, MAX_TURNS)
 
 ########### board sizing ############
 MAX_RING = 4
-MIN_RING = 1
-GEO_RING = 4
-if MIN_RING == 1:
-    NUM_SPACES = 2**(MAX_RING + 1) -2**(MIN_RING) #Get the number of spaces in the board (not including the center)
-elif MIN_RING > 1:
-    NUM_SPACES = 2**(MAX_RING + 1) -2**(MIN_RING - 1) #Get the number of spaces in the board (not including the center)
-else:
-    raise ValueError("MIN_RING must be >= 1")
+NUM_SPACES = (1 << (MAX_RING + 1)) - (1 << max(MIN_RING - 1, 1)) #Get the number of spaces in the board (not including the center)
 
 ########### initial token placement and attributes ############
-INIT_BOARD_PATTERN_P1 = [(-2,1), (-1,2), (0,2), (1,2), (2,1)] # (relative azim, number of pieces)
-INIT_BOARD_PATTERN_P2 = [(-2,1), (-1,2), (0,2), (1,2), (2,1)] # (relative azim, number of pieces)
+INIT_BOARD_PATTERN_P1 = ((-2,1), (-1,2), (0,2), (1,2), (2,1)) # (relative azim, number of pieces)
+INIT_BOARD_PATTERN_P2 = ((-2,1), (-1,2), (0,2), (1,2), (2,1)) # (relative azim, number of pieces)
 
 NUM_TOKENS_PER_PLAYER = {
-    U.P1: sum([a[1] for a in INIT_BOARD_PATTERN_P1])+1, #Get the number of tokens per player, plus 1 for the seeker
-    U.P2: sum([a[1] for a in INIT_BOARD_PATTERN_P2])+1 #Get the number of tokens per player, plus 1 for the seeker
-    }
-
-INIT_FUEL = {
-    U.P1:{
-        U.SEEKER:   100.0,
-        U.BLUDGER:  100.0,
-        },
-    U.P2:{
-        U.SEEKER:   100.0,
-        U.BLUDGER:  100.0,
-        }
-    }
-
-INIT_AMMO = {
-    U.P1:{
-        U.SEEKER:   0,
-        U.BLUDGER:  2,
-        },
-    U.P2:{
-        U.SEEKER:   0,
-        U.BLUDGER:  2,
-        },
-    }
-
-# engagement and movement parameters
-MIN_FUEL = 0.0
-
-FUEL_USAGE = {
-    U.P1:{
-        U.NOOP: 0.0,
-        U.DRIFT: 1.0, #Essentially the cost of station keeping
-        U.PROGRADE: 5.0, #make this lower than radial in/out was 10
-        U.RETROGRADE: 5.0,
-        U.RADIAL_IN: 10.0, #These should be higher, probably 10, was 5
-        U.RADIAL_OUT: 10.0,
-        U.IN_SEC:{
-            U.SHOOT: 5.0,
-            U.COLLIDE: 10.0,
-            U.GUARD: 5.0
-        },
-        U.ADJ_SEC:{
-            U.SHOOT: 5.0, #increased from 5
-            U.COLLIDE: 20.0, #Should be higher, was 20
-            U.GUARD: 10.0
-        }
-    },
-    U.P2:{
-        U.NOOP: 0.0,
-        U.DRIFT: 1.0, #Essentially the cost of station keeping
-        U.PROGRADE: 5.0, #make this lower than radial in/out was 10
-        U.RETROGRADE: 5.0,
-        U.RADIAL_IN: 10.0, #These should be higher, probably 10, was 5
-        U.RADIAL_OUT: 10.0,
-        U.IN_SEC:{
-            U.SHOOT: 5.0,
-            U.COLLIDE: 10.0,
-            U.GUARD: 5.0
-        },
-        U.ADJ_SEC:{
-            U.SHOOT: 5.0, #increased from 5
-            U.COLLIDE: 20.0, #Should be higher, was 20
-            U.GUARD: 10.0
-        }
-    }
-}
-
-
-ENGAGE_PROBS = {
-    U.P1:{
-        U.IN_SEC:{
-            U.NOOP: 1.0,
-            U.SHOOT: 0.8, 
-            U.COLLIDE: 0.8,
-            U.GUARD: 0.8},
-        U.ADJ_SEC:{
-            U.NOOP: 1.0,
-            U.SHOOT: 0.4, #These should be lower, maybe 0.3,0.4,0.5
-            U.COLLIDE: 0.4,
-            U.GUARD: 0.4
-        }
-    },
-    U.P2:{
-        U.IN_SEC:{
-            U.NOOP: 1.0,
-            U.SHOOT: 0.8, 
-            U.COLLIDE: 0.8,
-            U.GUARD: 0.8},
-        U.ADJ_SEC:{
-            U.NOOP: 1.0,
-            U.SHOOT: 0.4, #These should be lower, maybe 0.3,0.4,0.5
-            U.COLLIDE: 0.4,
-            U.GUARD: 0.4
-        }
+    U.P1: sum(a[1] for a in INIT_BOARD_PATTERN_P1)+1, #Get the number of tokens per player, plus 1 for the seeker
+    U.P2: sum(a[1] for a in INIT_BOARD_PATTERN_P2)+1 #Get the number of tokens per player, plus 1 for the seeker
     }
-}
-
-# scoring and game termination
-IN_GOAL_POINTS = {
-    U.P1:10.0,
-    U.P2:10.0
-    }
-
-ADJ_GOAL_POINTS = {
-    U.P1:3.0,
-    U.P2:3.0
-    }
-
-FUEL_POINTS_FACTOR = {
-    U.P1:1.0,
-    U.P2:1.0
-    }
-
-FUEL_POINTS_FACTOR_BLUDGER = {
-    U.P1:0.1,
-    U.P2:0.1
-    }
-
-WIN_SCORE = {
-    U.P1:350.0,
-    U.P2:350.0
-    }
-
-ILLEGAL_ACT_SCORE = -1000.0
-MAX_TURNS = 50 #reduced from 100 to 50
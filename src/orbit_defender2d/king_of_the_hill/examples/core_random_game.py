@@ -5,6 +5,7 @@
 # this is meant as a sandbox for running a complete koth game
 # with random-yet-valid agents
 
+import sys
 import numpy as np
 import orbit_defender2d.utils.utils as U
 import orbit_defender2d.king_of_the_hill.default_game_parameters as DGP
@@ -31,38 +32,46 @@ GAME_PARAMS = koth.KOTHGameInputArgs(
     fuel_points_factor_bludger=DGP.FUEL_POINTS_FACTOR_BLUDGER,
     )
 
+# per-turn printing is skipped when output is redirected (e.g. batch runs), set True to force it
+VERBOSE = sys.stdout.isatty()
+
 def print_game_info(game):
     # print("alpha player state: ")
     # for tok in game.game_state[U.P1][U.TOKEN_STATES]:
     #     print("-->{} | fuel: {} | position: {}".format(tok.satellite.fuel, tok.position))
-    print("STATES:")
-    for toknm, tok in game.token_catalog.items():
-        print("   {:<16s}| position: {:<4d}| fuel: {:<8.1f} ".format(toknm, tok.position, tok.satellite.fuel))
-    print("alpha|beta score: {}|{}".format(game.game_state[U.P1][U.SCORE],game.game_state[U.P2][U.SCORE]))
+    lines = ["STATES:"]
+    lines.extend(f"   {toknm:<16s}| position: {tok.position:<4d}| fuel: {tok.satellite.fuel:<8.1f} " 
+        for toknm, tok in game.token_catalog.items())
+    lines.append("alpha|beta score: {}|{}\n".format(game.game_state[U.P1][U.SCORE],game.game_state[U.P2][U.SCORE]))
+    sys.stdout.write("\n".join(lines))
 
 def print_actions(actions):
-    print("ACTIONS:")
+    lines = ["ACTIONS:"]
     if actions is None:
-        print("   None")
+        lines.append("   None")
     else:
-        for toknm, act in actions.items():
-            print("   {:<15s} | {}".format(toknm, act))
+        lines.extend(f"   {toknm:<15s} | {act}" for toknm, act in actions.items())
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def run_core_random_game():
 
     # create and initialize game
-    game = KOTHGame(**GAME_PARAMS._asdict())
+    game = KOTHGame.from_args(GAME_PARAMS)
     # game.game_state, game.token_catalog, game.n_tokens_alpha, game.n_tokens_beta = \
     #     game.initial_game_state(init_pattern_alpha=INIT_BOARD_PATTERN_2, init_pattern_beta=INIT_BOARD_PATTERN_2)
 
+    # sampler caches legal actions between phase changes
+    sampler = koth.RandomValidActionSampler(game)
+
     # iterate through game with valid random actions
     while not game.game_state[U.GAME_DONE]:
 
-        print("\n<==== Turn: {} | Phase: {} ====>".format(game.game_state[U.TURN_COUNT], game.game_state[U.TURN_PHASE]))
+        if VERBOSE:
+            print("\n<==== Turn: {} | Phase: {} ====>".format(game.game_state[U.TURN_COUNT], game.game_state[U.TURN_PHASE]))
 
         # draw random legal actions:
-        actions = game.get_random_valid_actions()
+        actions = sampler.sample()
         # actions = None
         # if game.game_state[U.TURN_PHASE] != U.DRIFT:
         #     actions = {t:a[np.random.choice(len(a))] for t, a in game.game_state[U.LEGAL_ACTIONS].items()}
@@ -74,13 +83,15 @@ def run_core_random_game():
         #             target=a.target, 
         #             prob=game.get_engagement_probability(t, a.target, a.action_type)) for  t, a in actions.items()}
 
-        print_actions(actions)
+        if VERBOSE:
+            print_actions(actions)
 
         # apply actions
         game.apply_verbose_actions(actions=actions)
 
         # print out salient game state
-        print_game_info(game)
+        if VERBOSE:
+            print_game_info(game)
 
     winner = None
     alpha_score = game.game_state[U.P1][U.SCORE]
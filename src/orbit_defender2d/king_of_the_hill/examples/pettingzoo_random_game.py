@@ -5,47 +5,54 @@
 # this is meant as a sandbox for running a complete koth game
 # with random-yet-valid agents
 
-import numpy as np
+import sys
+from math import isclose
 import orbit_defender2d.utils.utils as U
 import orbit_defender2d.king_of_the_hill.pettingzoo_env as PZE
 from orbit_defender2d.king_of_the_hill import koth
 
+# per-turn printing is skipped when output is redirected (e.g. batch runs), set True to force it
+VERBOSE = sys.stdout.isatty()
+
 def run_pettingzoo_random_game():
 
     # create and reset pettingzoo env
     penv = PZE.parallel_env()
     penv.reset()
 
+    # sampler caches legal actions between phase changes
+    sampler = koth.RandomValidActionSampler(penv.kothgame)
+
     # iterate through game with valid random actions
     while True:
 
-        print("\n<==== Turn: {} | Phase: {} ====>".format(
-            penv.kothgame.game_state[U.TURN_COUNT], 
-            penv.kothgame.game_state[U.TURN_PHASE]))
+        if VERBOSE:
+            print("\n<==== Turn: {} | Phase: {} ====>".format(
+                penv.kothgame.game_state[U.TURN_COUNT], 
+                penv.kothgame.game_state[U.TURN_PHASE]))
 
         # draw random legal actions:
-        actions = penv.kothgame.get_random_valid_actions()
-        koth.print_actions(actions)
-
-        # encode actions into flat gym space
-        encoded_actions = penv.encode_all_discrete_actions(actions=actions)
+        actions = sampler.sample()
+        if VERBOSE:
+            koth.print_actions(actions)
 
-        # apply encoded actions
-        observations, rewards, dones, info = penv.step(actions=encoded_actions)
+        # apply verbose actions directly, no need to encode into flat gym space
+        observations, rewards, dones, info = penv.step_native(actions)
 
         # assert zero-sum game
-        assert np.isclose(rewards[U.P1], -rewards[U.P2])
+        assert isclose(rewards[U.P1], -rewards[U.P2], rel_tol=PZE.REWARD_RTOL, abs_tol=PZE.REWARD_ATOL)
 
         # print out salient game state
-        koth.print_game_info(penv.kothgame)
+        if VERBOSE:
+            koth.print_game_info(penv.kothgame)
 
         # assert rewards only from final timestep
-        if any([dones[d] for d in dones.keys()]):
-            assert np.isclose(rewards[U.P1], 
-                penv.kothgame.game_state[U.P1][U.SCORE] - penv.kothgame.game_state[U.P2][U.SCORE])
+        if any(dones.values()):
+            assert isclose(rewards[U.P1], 
+                penv.kothgame.game_state[U.P1][U.SCORE] - penv.kothgame.game_state[U.P2][U.SCORE], rel_tol=PZE.REWARD_RTOL, abs_tol=PZE.REWARD_ATOL)
             break
         else:
-            assert np.isclose(rewards[U.P1], 0.0)
+            assert isclose(rewards[U.P1], 0.0, rel_tol=PZE.REWARD_RTOL, abs_tol=PZE.REWARD_ATOL)
 
     winner = None
     alpha_score = penv.kothgame.game_state[U.P1][U.SCORE]
@@ -5,7 +5,7 @@
 # this is meant as a sandbox for running a complete koth game
 # with random-yet-valid agents
 
-import numpy as np
+from math import isclose
 import orbit_defender2d.utils.utils as U
 import orbit_defender2d.king_of_the_hill.pettingzoo_env as PZE
 from orbit_defender2d.king_of_the_hill import koth
@@ -20,9 +20,10 @@ if __name__ == "__main__":
     # iterate through game with valid random actions
     while True:
 
+        cur_game_state = penv.kothgame.game_state
         print("\n<==== Turn: {} | Phase: {} ====>".format(
-            penv.kothgame.game_state[U.TURN_COUNT], 
-            penv.kothgame.game_state[U.TURN_PHASE]))
+            cur_game_state[U.TURN_COUNT], 
+            cur_game_state[U.TURN_PHASE]))
 
         # draw random legal actions:
         actions = penv.kothgame.get_random_valid_actions()
@@ -32,29 +33,29 @@ if __name__ == "__main__":
         # update rendered pygame window with latency for user comprehension
         penv.render(mode="debug")
 
-        # encode actions into flat gym space
-        encoded_actions = penv.encode_all_discrete_actions(actions=actions)
-
-        # apply encoded actions
-        observations, rewards, dones, info = penv.step(actions=encoded_actions)
+        # apply verbose actions directly, no need to encode into flat gym space
+        observations, rewards, dones, info = penv.step_native(actions)
 
         # assert zero-sum game
-        assert np.isclose(rewards[U.P1], -rewards[U.P2])
+        assert isclose(rewards[U.P1], -rewards[U.P2], rel_tol=PZE.REWARD_RTOL, abs_tol=PZE.REWARD_ATOL)
 
         # print out salient game state
         koth.print_game_info(penv.kothgame)
 
         # assert rewards only from final timestep
-        if any([dones[d] for d in dones.keys()]):
-            assert np.isclose(rewards[U.P1], 
-                penv.kothgame.game_state[U.P1][U.SCORE] - penv.kothgame.game_state[U.P2][U.SCORE])
+        if any(dones.values()):
+            assert isclose(rewards[U.P1], 
+                cur_game_state[U.P1][U.SCORE] - cur_game_state[U.P2][U.SCORE], rel_tol=PZE.REWARD_RTOL, abs_tol=PZE.REWARD_ATOL)
             break
         else:
-            assert np.isclose(rewards[U.P1], 0.0)
+            assert isclose(rewards[U.P1], 0.0, rel_tol=PZE.REWARD_RTOL, abs_tol=PZE.REWARD_ATOL)
 
     winner = None
-    alpha_score = penv.kothgame.game_state[U.P1][U.SCORE]
-    beta_score = penv.kothgame.game_state[U.P2][U.SCORE]
+    cur_game_state = penv.kothgame.game_state
+    alpha_state = cur_game_state[U.P1]
+    beta_state = cur_game_state[U.P2]
+    alpha_score = alpha_state[U.SCORE]
+    beta_score = beta_state[U.SCORE]
     if alpha_score > beta_score:
         winner = U.P1
     elif beta_score > alpha_score:
@@ -62,18 +63,15 @@ if __name__ == "__main__":
     else:
         winner = 'draw'
     
-    if penv.kothgame.game_state[U.P1][U.TOKEN_STATES][0].satellite.fuel <= DGP.MIN_FUEL:
-        term_cond = "alpha seeker out of fuel"
-    elif penv.kothgame.game_state[U.P2][U.TOKEN_STATES][0].satellite.fuel <= DGP.MIN_FUEL:
-        term_cond = "beta seeker out of fuel"
-    elif alpha_score >= DGP.WIN_SCORE:
-        term_cond = "alpha reached Win Score"
-    elif beta_score  >= DGP.WIN_SCORE:
-        term_cond = "beta reached Win Score"
-    elif penv.kothgame.game_state[U.TURN_COUNT]  >= DGP.MAX_TURNS:
-        term_cond = "max turns reached" 
-    else:
-        term_cond = "unknown"
+    # termination conditions in order of precedence, first one met is reported
+    term_conds = (
+        (alpha_state[U.TOKEN_STATES][0].satellite.fuel <= DGP.MIN_FUEL, "alpha seeker out of fuel"),
+        (beta_state[U.TOKEN_STATES][0].satellite.fuel <= DGP.MIN_FUEL, "beta seeker out of fuel"),
+        (alpha_score >= DGP.WIN_SCORE[U.P1], "alpha reached Win Score"),
+        (beta_score >= DGP.WIN_SCORE[U.P2], "beta reached Win Score"),
+        (cur_game_state[U.TURN_COUNT] >= DGP.MAX_TURNS, "max turns reached"),
+    )
+    term_cond = next((label for met, label in term_conds if met), "unknown")
 
     print(
         "\n====GAME FINISHED====\n" +
@@ -1,6 +1,7 @@
 # Demonstrate a CLI based player interaface, playing against a trained AI agent
 
 import numpy as np
+from math import isclose
 import orbit_defender2d.utils.utils as U
 from CLI_example import CLI_example_GP as GP
 from orbit_defender2d.king_of_the_hill import koth
@@ -31,21 +32,51 @@ GAME_PARAMS = koth.KOTHGameInputArgs(
     fuel_points_factor_bludger=GP.FUEL_POINTS_FACTOR_BLUDGER,
     )
 
+# single worker thread, reused every turn, for blocking CLI input
+_INPUT_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+# render(mode="human") pumps window events for about 1 s per call (see
+# parallel_env._watch_for_window_resize), so the window is redrawn roughly once
+# a second while waiting for CLI input; between redraws only poll for the input
+INPUT_POLL_TIMEOUT = 0  # [s]
+
 
 def get_engagement_dict_from_list(engagement_list):
     """
     Turns a list of engagement tuples or engagement outcome tuples into a list of dicts with the key as the token name and the tuple as the value
     """
-    engagement_dict = {}
-    for eng in engagement_list:
-        engagement_dict[eng.attacker] = eng
-    return engagement_dict
+    return {eng.attacker: eng for eng in engagement_list}
+
+def load_model(model_path):
+    '''load TorchScript policy, frozen and optimized for single-sample inference'''
+    model = torch.jit.load(model_path)
+    model.eval()
+    return torch.jit.optimize_for_inference(torch.jit.freeze(model))
 
-def run_game(model_path_beta):
+def run_game(model_beta):
 
     # create and reset pettingzoo env
     penv = PZE.parallel_env(game_params=GAME_PARAMS, training_randomize=False)
     obs = penv.reset()
+
+    # shape of the model output for a single player, see pettingzoo_env.KOTHActionSpaces
+    n_tokens = penv.n_tokens_per_player
+    n_acts_per_token = penv.act_space_info.per_token.n
+
+    # model input is the flattened action mask followed by the observation, 
+    # allocate it once and copy each new observation into it
+    am_len = np.size(obs[U.P2]['action_mask'])
+    obs_len = np.size(obs[U.P2]['observation'])
+    obs_buf = torch.zeros((1, am_len + obs_len), dtype=torch.float32)
+    obs_am_view = obs_buf[0, :am_len]
+    obs_obs_view = obs_buf[0, am_len:]
+    new_obs_dict_beta = {'obs': obs_buf}
+    model_state = [torch.tensor([0.0], dtype=torch.float32)]
+    model_seq_lens = torch.tensor([0], dtype=torch.int64)
+
+    # warm-up pass so the first real turn does not pay graph optimization cost
+    with torch.inference_mode():
+        model_beta(new_obs_dict_beta, model_state, model_seq_lens)
+
     # Update rendered pygame window
     #penv.render(mode="debug")
     #Get the user's name:
@@ -66,61 +97,40 @@ def run_game(model_path_beta):
     penv.render(mode="human")
     #penv.screen_shot(file_name="./od2d_screen_shot_new.png")
     
-    model_beta = torch.jit.load(model_path_beta)
-    model_beta.eval()
-
     # iterate through game with valid random actions
     while True:
         # Update rendered pygame window
         penv.render(mode="human")
 
+        cur_game_state = penv.kothgame.game_state
         print("\n<==== Turn: {} | Phase: {} ====>".format(
-            penv.kothgame.game_state[U.TURN_COUNT], 
-            penv.kothgame.game_state[U.TURN_PHASE]))
+            cur_game_state[U.TURN_COUNT], 
+            cur_game_state[U.TURN_PHASE]))
         koth.print_scores(penv.kothgame)
 
-        #Get actions from loaded policy to compare with actions from ray policy
-        new_obs_tensor_beta = torch.tensor(obs[U.P2]['observation'], dtype=torch.float32)
-
-        #Get Action masks
-        new_obs_tensor_am_beta = torch.tensor(obs[U.P2]['action_mask'], dtype=torch.float32)
-        new_obs_tensor_am_beta = new_obs_tensor_am_beta.reshape(-1,)
-        
-        #Concatenate the action mask and observation tensors
-        new_obs_dict_beta = {'obs':torch.cat((new_obs_tensor_am_beta,new_obs_tensor_beta),dim=0).unsqueeze(0)}
+        #Copy the action mask and observation into the model input buffer
+        obs_am_view.copy_(torch.from_numpy(np.asarray(obs[U.P2]['action_mask']).reshape(-1)))
+        obs_obs_view.copy_(torch.from_numpy(np.asarray(obs[U.P2]['observation']).reshape(-1)))
 
         #Get the actions from the loaded policy
-        acts_beta = model_beta(new_obs_dict_beta, [torch.tensor([0.0], dtype=torch.float32)], torch.tensor([0], dtype=torch.int64))      
+        with torch.inference_mode():
+            acts_beta = model_beta(new_obs_dict_beta, model_state, model_seq_lens)
     
         #Format the acts_model as a gym spaces touple which is the same as the action space tuple defined in 
         # pettingzoo_env.py as self.per_player = spaces.Tuple(tuple([self.per_token for _ in range(self.n_tokens_per_player)])) 
-        # where self.per_token = spaces.Discrete(38) and self.n_tokens_per_player = 11
-        #TODO: Get rid of hard coded values 11 and 38. 
-        acts_beta_reshaped = acts_beta[0].reshape(11,38)
-        acts_beta_split = torch.split(acts_beta_reshaped, 1, dim=0)
-       
-
-        acts_beta_list = []
-
-        for i in range(11):
-
-            acts_beta_list.append((torch.argmax(acts_beta_split[i]).item()))
-
-        acts_beta_tuple = tuple(acts_beta_list)
+        # Take the argmax of every token's action logits in a single op
+        acts_beta_reshaped = acts_beta[0].reshape(n_tokens, n_acts_per_token)
+        acts_beta_tuple = tuple(acts_beta_reshaped.argmax(dim=1).tolist())
 
         #Decode the actions from the model into the action dicts that can be used by koth
         actions_beta_dict = penv.decode_discrete_player_action(U.P2,acts_beta_tuple)
 
-        #Get the actions from the player
-        acts_received = False
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            t = executor.submit(koth.KOTHGame.get_input_actions, penv.kothgame, U.P1)
-            while not acts_received:
-                if t.done():
-                    acts_received = True
-                    actions_alpha_dict = t.result()
-                sleep(1)
-                penv.render(mode="human")
+        #Get the actions from the player, keeping the window rendered while waiting for input
+        t = _INPUT_EXECUTOR.submit(koth.KOTHGame.get_input_actions, penv.kothgame, U.P1)
+        while not t.done():
+            concurrent.futures.wait([t], timeout=INPUT_POLL_TIMEOUT)
+            penv.render(mode="human")
+        actions_alpha_dict = t.result()
 
         actions = {}
         actions.update(actions_alpha_dict)
@@ -133,38 +143,38 @@ def run_game(model_path_beta):
         # Update rendered pygame window
         penv.render(mode="human")
 
-        # encode actions into flat gym space
-        encoded_actions = penv.encode_all_discrete_actions(actions=actions)
-
-        # apply encoded actions
-        obs, rewards, dones, info = penv.step(actions=encoded_actions)
+        # apply verbose actions directly, no need to encode into flat gym space
+        obs, rewards, dones, info = penv.step_native(actions)
 
         # assert zero-sum game
-        assert np.isclose(rewards[U.P1], -rewards[U.P2])
+        assert isclose(rewards[U.P1], -rewards[U.P2], rel_tol=PZE.REWARD_RTOL, abs_tol=PZE.REWARD_ATOL)
 
         #If game_sate is "MOVEMENT" Then print the engagement outcomes from the prior ENGAGEMENT phase
-        if penv.kothgame.game_state[U.TURN_PHASE] == U.MOVEMENT and penv.kothgame.game_state[U.TURN_COUNT] > 0:
+        if cur_game_state[U.TURN_PHASE] == U.MOVEMENT and cur_game_state[U.TURN_COUNT] > 0:
             koth.print_engagement_outcomes(penv.kothgame.engagement_outcomes)
             engagement_outcomes_dict = get_engagement_dict_from_list(penv.kothgame.engagement_outcomes)
             penv.actions = engagement_outcomes_dict #Add actions to the penv sot that they can be rendered
             penv._eg_outcomes_phase = True
-            penv.kothgame.game_state[U.TURN_PHASE] = U.ENGAGEMENT
+            cur_game_state[U.TURN_PHASE] = U.ENGAGEMENT
             penv.render(mode="human")
             sleep(5)
             penv._eg_outcomes_phase = False
-            penv.kothgame.game_state[U.TURN_PHASE] = U.MOVEMENT
+            cur_game_state[U.TURN_PHASE] = U.MOVEMENT
 
         # assert rewards only from final timestep
-        if any([dones[d] for d in dones.keys()]):
-            assert np.isclose(rewards[U.P1], 
-                penv.kothgame.game_state[U.P1][U.SCORE] - penv.kothgame.game_state[U.P2][U.SCORE])
+        if any(dones.values()):
+            assert isclose(rewards[U.P1], 
+                cur_game_state[U.P1][U.SCORE] - cur_game_state[U.P2][U.SCORE], rel_tol=PZE.REWARD_RTOL, abs_tol=PZE.REWARD_ATOL)
             break
         else:
-            assert np.isclose(rewards[U.P1], 0.0)
+            assert isclose(rewards[U.P1], 0.0, rel_tol=PZE.REWARD_RTOL, abs_tol=PZE.REWARD_ATOL)
 
     winner = None
-    alpha_score = penv.kothgame.game_state[U.P1][U.SCORE]
-    beta_score = penv.kothgame.game_state[U.P2][U.SCORE]
+    cur_game_state = penv.kothgame.game_state
+    alpha_state = cur_game_state[U.P1]
+    beta_state = cur_game_state[U.P2]
+    alpha_score = alpha_state[U.SCORE]
+    beta_score = beta_state[U.SCORE]
     if alpha_score > beta_score:
         winner = U.P1
     elif beta_score > alpha_score:
@@ -176,17 +186,17 @@ def run_game(model_path_beta):
     koth.print_engagement_outcomes(penv.kothgame.engagement_outcomes)
     koth.log_game_to_file(penv.kothgame, logfile=logfile, actions=actions)
 
-    cur_game_state = penv.kothgame.game_state
-    if cur_game_state[U.P1][U.TOKEN_STATES][0].satellite.fuel <= GP.MIN_FUEL:
-        print(U.P1+" seeker out of fuel")
-    if cur_game_state[U.P2][U.TOKEN_STATES][0].satellite.fuel <= GP.MIN_FUEL:
-        print(U.P2+" seeker out of fuel")
-    if cur_game_state[U.P1][U.SCORE] >= GP.WIN_SCORE[U.P1]:
-        print(U.P1+" reached Win Score")
-    if cur_game_state[U.P2][U.SCORE]  >= GP.WIN_SCORE[U.P2]:
-        print(U.P2+" reached Win Score")
-    if cur_game_state[U.TURN_COUNT]  >= GP.MAX_TURNS:
-        print("max turns reached")
+    # report every termination condition that was met
+    term_conds = (
+        (alpha_state[U.TOKEN_STATES][0].satellite.fuel <= GP.MIN_FUEL, U.P1+" seeker out of fuel"),
+        (beta_state[U.TOKEN_STATES][0].satellite.fuel <= GP.MIN_FUEL, U.P2+" seeker out of fuel"),
+        (alpha_score >= GP.WIN_SCORE[U.P1], U.P1+" reached Win Score"),
+        (beta_score >= GP.WIN_SCORE[U.P2], U.P2+" reached Win Score"),
+        (cur_game_state[U.TURN_COUNT] >= GP.MAX_TURNS, "max turns reached"),
+    )
+    for met, label in term_conds:
+        if met:
+            print(label)
         
     print("\n====GAME FINISHED====\nWinner: {}\nScore: {}|{}\n=====================\n".format(winner, alpha_score, beta_score))
 
@@ -209,4 +219,8 @@ if __name__ == "__main__" or __name__ == "checkpoint_just_torch_CLI":
 
     model_path_beta = "./CLI_example/model_3800_smallBoard_15March.pt" #3800 iterations of board without outer ring. Trained on randagm init game params.
 
-    run_game(model_path_beta)
+    # single-sample inference is too small to benefit from intra-op parallelism
+    torch.set_num_threads(1)
+    model_beta = load_model(model_path_beta)
+
+    run_game(model_beta)
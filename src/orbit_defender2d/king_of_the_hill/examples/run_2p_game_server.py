@@ -1,9 +1,11 @@
 #Need this to start the game server and register the alpah client. Another script will register the beta client.
 #I could do this as a stand alone server program, but would have to make sure to send reset requests from teh clients when they join and not sure how to 
 #Register new player does a reset on the game, so that could work...
+#Game state validation in the listener is only done in debug mode, run with `python -O run_2p_game_server.py` to skip it entirely
 
 import zmq
-import threading
+import zmq.asyncio
+import asyncio
 import numpy as np
 import orbit_defender2d.utils.utils as U
 import copy
@@ -14,8 +16,6 @@ from orbit_defender2d.king_of_the_hill import koth
 from orbit_defender2d.king_of_the_hill import game_server as GS
 from orbit_defender2d.king_of_the_hill.examples.server_utils import *
 
-from time import sleep
-
 # Game Parameters
 GAME_PARAMS = koth.KOTHGameInputArgs(
     max_ring=DGP.MAX_RING,
@@ -36,11 +36,47 @@ GAME_PARAMS = koth.KOTHGameInputArgs(
     max_turns=DGP.MAX_TURNS,
     fuel_points_factor_bludger=DGP.FUEL_POINTS_FACTOR_BLUDGER,
     )
+SEND_RETRIES = 5
+
+class ProtocolError(ValueError):
+    '''reply from game server does not match the expected message structure'''
+    pass
+
+# expected reply contexts and kinds for each request type
+_ACTION_CONTEXTS = (GS.DRIFT_PHASE, GS.MOVE_PHASE, GS.ENGAGE_PHASE)
+_PHASE_KINDS = (GS.WAITING_RESP, GS.ADVANCING_RESP)
+
+def _validate_reply(rep, expected_ctx, expected_kinds):
+    '''structural check of a server reply, only called when __debug__ is True
+
+    Args:
+        rep : dict
+            deserialized reply message
+        expected_ctx : tuple
+            acceptable values of the reply context
+        expected_kinds : tuple
+            acceptable values of the reply data kind
+
+    Raises:
+        ProtocolError : reply contains an error or does not match expectations
+    '''
+    err = rep.get(GS.ERROR)
+    if err is not None:
+        raise ProtocolError("error received: {}".format(err.get(GS.MESSAGE)))
+    if rep.get(GS.API_VERSION) != API_VER_NUM_2P:
+        raise ProtocolError("expected api version {}, got {}".format(API_VER_NUM_2P, rep.get(GS.API_VERSION)))
+    ctx = rep.get(GS.CONTEXT)
+    if ctx not in expected_ctx:
+        raise ProtocolError("expected context in {}, got {}".format(expected_ctx, ctx))
+    data = rep.get(GS.DATA)
+    kind = data.get(GS.KIND) if data is not None else None
+    if kind not in expected_kinds:
+        raise ProtocolError("expected kind in {}, got {}".format(expected_kinds, kind))
 
 class ListenerClient(object):
     '''bundles REQ and SUB sockets in one object'''
-    def __init__(self, router_addr, pub_addr, plr_alias, sub_topic=''):
-        ''' Create req and sub socket, and a thread for subsciption handling
+    def __init__(self, router_addr, pub_addr, plr_alias, sub_topics=None, ctx=None):
+        ''' Create req and sub socket, and a task for subsciption handling
         Args:
             router_addr : str
                 IP+port number for connection to server ROUTER
@@ -48,46 +84,78 @@ class ListenerClient(object):
                 IP+port number for connection to server PUB
             plr_alias : str
                 alias used for registered player in KOTH game
-            sub_topic : str
-                topic for SUB subscription
+            sub_topics : list(bytes)
+                topics (message prefixes) for SUB subscription. Defaults to
+                the game state messages of API_VER_NUM_2P, see GS.pub_topic
+            ctx : zmq.asyncio.Context
+                context in which to create sockets. Defaults to the process-wide 
+                shared instance so that it is reused across server restarts
 
         Notes:
-            Want to use threads, not multiple processes, because I wanted shared memory objects
+            Must be instantiated from within a running asyncio event loop.
+            Requests and subscription handling share one thread, so no lock 
+            is needed around the game state
         
         Refs:
-            https://realpython.com/intro-to-python-threading/
-            https://stackoverflow.com/questions/24843193/stopping-a-python-thread-running-an-infinite-loop
+            https://pyzmq.readthedocs.io/en/latest/api/zmq.asyncio.html
         '''
 
         super().__init__()
 
-        ctx = zmq.Context()
+        if ctx is None:
+            ctx = zmq.asyncio.Context.instance()
         self.alias = plr_alias
         self.player_id = None
         self.game_state = None
+        self._my_tokens = []
         self.actions = None
         self.player_registry = None
-        self._lock = threading.Lock()
-        self._stop = threading.Event()
+
+        # validate only every n-th received game state, skipped entirely under python -O
+        self._validate_every = 16
+        self._recv_ctr = 0
+
+        # set by subscription task when first game state (with player registry)
+        # is received and when a terminal game state is received
+        self.game_started_evt = asyncio.Event()
+        self.game_done_evt = asyncio.Event()
 
         # establish REQ socket and connect to ROUTER
         self.req_socket = ctx.socket(zmq.REQ)
+        for opt, val in CLIENT_SOCKET_OPTIONS.items():
+            self.req_socket.setsockopt(opt, val)
         self.req_socket.connect(router_addr)
 
         # establish SUB socket and connect to PUB
         self.sub_socket = ctx.socket(zmq.SUB)
+        for opt, val in CLIENT_SOCKET_OPTIONS.items():
+            self.sub_socket.setsockopt(opt, val)
         # must set a subscription, missing this step is a common mistake. 
         # https://zguide.zeromq.org/docs/chapter1/#Getting-the-Message-Out
-        self.sub_socket.setsockopt_string(zmq.SUBSCRIBE, sub_topic) 
+        # Messages not matching a topic are dropped by libzmq before reaching python
+        if sub_topics is None:
+            sub_topics = [GS.pub_topic(API_VER_NUM_2P, c) for c in SUB_CONTEXTS]
+        for topic in sub_topics:
+            self.sub_socket.setsockopt(zmq.SUBSCRIBE, topic)
         self.sub_socket.connect(pub_addr)
 
-        # establish subscription thread
-        # make daemon so it is killed when __main__ ends
-        # sub_thread = threading.Thread(target=self.subscriber_func, daemon=True)
-        sub_thread = threading.Thread(target=self.subscriber_func)
-        sub_thread.start()
+        # establish subscription task on the running event loop
+        self._sub_task = asyncio.create_task(self.subscriber_coro())
+        self._sub_task.add_done_callback(report_task_failure)
+
+    async def wait_game_started(self):
+        '''wait for first game state, raising if the subscription task fails first'''
+        await wait_event_or_task(self.game_started_evt, self._sub_task)
+
+    async def wait_game_done(self, timeout=None):
+        '''wait for terminal game state, raising if the subscription task fails first
+
+        Returns:
+            bool : True if game is done (False if timed out)
+        '''
+        return await wait_event_or_task(self.game_done_evt, self._sub_task, timeout=timeout)
 
-    def register_player_req(self):
+    async def register_player_req(self):
         '''format player registration request, send req, recv response, and check'''
 
         # format registration request message
@@ -97,17 +165,17 @@ class ListenerClient(object):
         req_msg['playerAlias'] = self.alias
 
         # send registration request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        await send_msg_async(self.req_socket, req_msg, retries=SEND_RETRIES)
+        rep_msg = await recv_msg_async(self.req_socket)
 
         # check registration successful
-        assert rep_msg['apiVersion'] == API_VER_NUM_2P
-        assert rep_msg['context'] == 'playerRegistration'
-        assert rep_msg['data']['kind'] == 'playerRegistrationResponse'
-        assert rep_msg['data']['playerAlias'] == self.alias
-        assert rep_msg[GS.DATA][GS.PLAYER_ID] in [U.P1, U.P2]
-        assert isinstance(rep_msg[GS.DATA][GS.PLAYER_UUID], str)
-        assert 'error' not in rep_msg.keys()
+        if __debug__:
+            _validate_reply(rep_msg, (GS.PLAYER_REGISTRATION,), (GS.PLAYER_REGISTRATION_RESP,))
+            data = rep_msg[GS.DATA]
+            if (data[GS.PLAYER_ALIAS] != self.alias or 
+                data[GS.PLAYER_ID] not in (U.P1, U.P2) or 
+                not isinstance(data[GS.PLAYER_UUID], str)):
+                raise ProtocolError("unexpected registration data: {}".format(data))
 
         # record backend player id
         self.player_id = rep_msg[GS.DATA][GS.PLAYER_ID]
@@ -120,7 +188,7 @@ class ListenerClient(object):
         reg_entry = reg_entry[0]
         assert reg_entry[GS.PLAYER_ID] == self.player_id, "Expect ID {}, got {}".format(self.player_id, reg_entry[GS.PLAYER_ID])
 
-    def game_reset_req(self):
+    async def game_reset_req(self):
         '''format game reset request, send request, recv response, and check'''
 
         # format game reset request message
@@ -131,16 +199,14 @@ class ListenerClient(object):
         req_msg['playerUUID'] = self.player_uuid
 
         # send game reset request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        await send_msg_async(self.req_socket, req_msg, retries=SEND_RETRIES)
+        rep_msg = await recv_msg_async(self.req_socket)
 
         # check reset waiting or advancing
-        assert rep_msg['apiVersion'] == API_VER_NUM_2P
-        assert rep_msg['context'] == 'gameReset'
-        assert rep_msg['data']['kind'] in ['waitingResponse', 'advancingResponse']
-        assert 'error' not in rep_msg.keys()
+        if __debug__:
+            _validate_reply(rep_msg, (GS.GAME_RESET,), _PHASE_KINDS)
 
-    def send_random_action_req(self, context):
+    async def send_random_action_req(self, context):
         ''' format and send random-yet-legal action depending on context '''
         req_msg = dict()
         req_msg['apiVersion'] = API_VER_NUM_2P
@@ -154,12 +220,12 @@ class ListenerClient(object):
             # select random valid action formatted as client request dictionary
             plr_actions = []
             req_msg[GS.DATA] = dict()
-            for tok in self.game_state[GS.TOKEN_STATES]:
-                if koth.parse_token_id(tok[GS.PIECE_ID])[0] == self.player_id:
-                    #act = tok[GS.LEGAL_ACTIONS][choice(len(tok[GS.LEGAL_ACTIONS]))]
-                    act = tok[GS.LEGAL_ACTIONS][0]
-                    act[GS.PIECE_ID] = tok[GS.PIECE_ID]
-                    plr_actions.append(act)
+            piece, la = GS.PIECE_ID, GS.LEGAL_ACTIONS
+            for tok in self._my_tokens:
+                #act = tok[la][choice(len(tok[la]))]
+                # copy selected action, legal actions belong to the received game state
+                act = {**tok[la][0], piece: tok[piece]}
+                plr_actions.append(act)
 
             if context == U.MOVEMENT:
                 req_msg[GS.CONTEXT] = GS.MOVE_PHASE
@@ -175,17 +241,15 @@ class ListenerClient(object):
                 raise ValueError
 
         # send game reset request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        await send_msg_async(self.req_socket, req_msg, retries=SEND_RETRIES)
+        rep_msg = await recv_msg_async(self.req_socket)
 
         # check reset waiting or advancing
-        assert rep_msg[GS.API_VERSION] == API_VER_NUM_2P
-        assert rep_msg[GS.CONTEXT] in [GS.DRIFT_PHASE, GS.MOVE_PHASE, GS.ENGAGE_PHASE]
-        assert 'error' not in rep_msg.keys(), "error received: {}".format(rep_msg[GS.ERROR][GS.MESSAGE])
-        assert rep_msg[GS.DATA][GS.KIND] in [GS.WAITING_RESP, GS.ADVANCING_RESP]
+        if __debug__:
+            _validate_reply(rep_msg, _ACTION_CONTEXTS, _PHASE_KINDS)
             
 
-    def drift_phase_req(self):
+    async def drift_phase_req(self):
         '''format drift request, send msg, recv response, and check'''
 
         # format drift request
@@ -196,78 +260,86 @@ class ListenerClient(object):
         req_msg['playerUUID'] = self.player_uuid
 
         # send drift request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        await send_msg_async(self.req_socket, req_msg, retries=SEND_RETRIES)
+        rep_msg = await recv_msg_async(self.req_socket)
 
         # check reset waiting or advancing
-        assert rep_msg['apiVersion'] == API_VER_NUM_2P
-        assert rep_msg['context'] == 'driftPhase'
-        assert rep_msg['data']['kind'] in ['waitingResponse', 'advancingResponse']
-        assert 'error' not in rep_msg.keys()
+        if __debug__:
+            _validate_reply(rep_msg, (GS.DRIFT_PHASE,), _PHASE_KINDS)
 
 
     def stop(self):
-        self._stop.set()
+        self._sub_task.cancel()
+
+    def close(self):
+        '''stop subscription and close sockets, leaving the (shared) context alive'''
+        self.stop()
+        self.req_socket.close(linger=0)
+        self.sub_socket.close(linger=0)
 
     def stopped(self):
-        return self._stop.isSet()
+        return self._sub_task.done()
 
-    def subscriber_func(self):
+    async def subscriber_coro(self):
         '''wait for and process message published on PUB
         
         Refs:
-            https://stackoverflow.com/questions/26012132/zero-mq-socket-recv-call-is-blocking
+            https://pyzmq.readthedocs.io/en/latest/api/zmq.asyncio.html
         '''
 
-        while not self.stopped():
-
-            try:
-
-                # wait for published message
-                msg = self.sub_socket.recv_json(flags=zmq.NOBLOCK)
-
-                # check message content
-                assert msg[GS.API_VERSION] == API_VER_NUM_2P, "expected {}, got {}".format(API_VER_NUM_2P, msg[GS.API_VERSION])
-                assert GS.ERROR not in msg.keys()
-
-                # if registry response, wait a little while for request socket in other thread to 
-                # to have time to receive registry info and update client info
-                if msg[GS.CONTEXT] == GS.PLAYER_REGISTRATION:
-                    sleep(0.25)
-
-                # verify registry and update game state (shared memory, therefore use a lock)
-                with self._lock:
-                    #self.assert_consistent_registry(msg[GS.DATA][GS.PLAYER_REGISTRY])
-                    self.game_state = msg[GS.DATA][GS.GAME_STATE]
-                    self.player_registry = msg[GS.DATA][GS.PLAYER_REGISTRY]
-                    self.actions = msg[GS.DATA][GS.ACTION_SELECTIONS]
-                    if msg[GS.DATA][GS.KIND] == GS.ENGAGE_PHASE_RESP:
-                        self.engagement_outcomes = msg[GS.DATA][GS.RESOLUTION_SEQUENCE]
-                    assert_valid_game_state(game_state=self.game_state)
-
-                print('{} client received and processed message on SUB!'.format(self.alias))
-
-            except zmq.Again as e:
-                # no messages waiting to be processed
-                pass
-
-
-ROUTER_PORT_NUM = 5555
-PUB_PORT_NUM = 5556
+        while True:
+
+            # wait for published message
+            msg = await recv_msg_async(self.sub_socket)
+
+            # check message content
+            if __debug__:
+                if msg.get(GS.API_VERSION) != API_VER_NUM_2P or GS.ERROR in msg:
+                    raise ProtocolError("unexpected published message: {}".format(msg))
+
+            # if registry response, wait a little while for request coroutine to 
+            # to have time to receive registry info and update client info
+            if msg[GS.CONTEXT] == GS.PLAYER_REGISTRATION:
+                await asyncio.sleep(0.25)
+
+            # verify registry and update game state
+            #self.assert_consistent_registry(msg[GS.DATA][GS.PLAYER_REGISTRY])
+            self.game_state = msg[GS.DATA][GS.GAME_STATE]
+            # cache this player's tokens once per state update, the listener
+            # itself never registers so there is nothing to cache unless it does
+            if self.player_id is not None:
+                parse, piece, pid = koth.parse_token_id, GS.PIECE_ID, self.player_id
+                self._my_tokens = [t for t in self.game_state[GS.TOKEN_STATES] 
+                    if parse(t[piece])[0] == pid]
+            self.player_registry = msg[GS.DATA][GS.PLAYER_REGISTRY]
+            self.actions = msg[GS.DATA][GS.ACTION_SELECTIONS]
+            if msg[GS.DATA][GS.KIND] == GS.ENGAGE_PHASE_RESP:
+                self.engagement_outcomes = msg[GS.DATA][GS.RESOLUTION_SEQUENCE]
+            if __debug__ and self._recv_ctr % self._validate_every == 0:
+                assert_valid_game_state(game_state=self.game_state)
+            self._recv_ctr += 1
+
+            # wake up anything waiting on game start/end
+            if self.player_registry is not None:
+                self.game_started_evt.set()
+            if self.game_state[GS.GAME_DONE]:
+                self.game_done_evt.set()
+
+            print('{} client received and processed message on SUB!'.format(self.alias))
 
 API_VER_NUM_2P = "v2022.07.26.0000.2p"
 
+# contexts of published game state messages the listener subscribes to
+SUB_CONTEXTS = [GS.PLAYER_REGISTRATION, GS.GAME_RESET, GS.MOVE_PHASE, GS.ENGAGE_PHASE, GS.DRIFT_PHASE]
+
 ECHO_REQ_MSG_0 = {'context': 'echo', 'data': {'key0': 'value0'}}
 
 def start_server():
     # create game object
-    game = koth.KOTHGame(**GAME_PARAMS._asdict())
+    game = koth.KOTHGame.from_args(GAME_PARAMS)
 
     # create game server
-    comm_configs = {
-        GS.ROUTER_PORT: ROUTER_PORT_NUM,
-        GS.PUB_PORT: PUB_PORT_NUM
-    }
+    comm_configs = server_comm_configs()
     game_server = GS.TwoPlayerGameServer(game=game, comm_configs=comm_configs)
 
     # start game server object
@@ -283,31 +355,21 @@ def start_server():
 def create_listener_client():
     #Register a listening client to monitor the game
     listener_client = ListenerClient(
-        router_addr="tcp://localhost:{}".format(ROUTER_PORT_NUM),
-        pub_addr="tcp://localhost:{}".format(PUB_PORT_NUM),
+        router_addr=ROUTER_ADDR,
+        pub_addr=PUB_ADDR,
         plr_alias='listener_client',)
     return listener_client
 
-def run_listener(game_server, listener_client, render=True):   
+async def run_listener(game_server, listener_client, render=True):   
     # Don't register the client as a player, just subscribe to the pub socket
-    tmp_game_state = listener_client.game_state
     game_started = False
     game_finised = False
 
-    while tmp_game_state is None:
-        sleep(5)
-        tmp_game_state = listener_client.game_state
-        print("Waiting for a game to begin")
-    
-    #Get the player registry
-    no_player_reg = True
-    while no_player_reg:
-        plr_reg = listener_client.player_registry
-        if plr_reg is not None:
-            no_player_reg = False
-        else:
-            print("Waiting for player registry...")
-            sleep(1)
+    # wait for first game state and player registry
+    print("Waiting for a game to begin")
+    await listener_client.wait_game_started()
+    tmp_game_state = listener_client.game_state
+    plr_reg = listener_client.player_registry
     
     game_started = True
     print("Game started")
@@ -360,7 +422,8 @@ def run_listener(game_server, listener_client, render=True):
             koth.log_game_to_file(local_game, logfile)
             break
         print("Waiting for game to finish")
-        sleep(1)
+        # refresh render periodically, but wake up immediately when game ends
+        await listener_client.wait_game_done(timeout=1)
 
     # Game is finished, print final info and get winner
     winner = None
@@ -375,31 +438,37 @@ def run_listener(game_server, listener_client, render=True):
 
     if render:
         penv.render(mode='human')
-        sleep(1)
+        await asyncio.sleep(1)
         penv.draw_win(winner)
-        sleep(10)
+        await asyncio.sleep(10)
         penv.close()
 
     game_finised = True
     print("Game finished")
     
-    restart_server(game_server, listener_client)
+    await restart_server(game_server, listener_client)
 
-def restart_server(game_server, listener_client):
+async def restart_server(game_server, listener_client):
     #Restart the game server and listener client
-    #Stop the listener client if it exists
-    listener_client.stop()
+    #Stop the listener client and release its sockets
+    listener_client.close()
     del listener_client
 
+    # blocking process calls are run in the default executor to keep the event loop free
+    loop = asyncio.get_running_loop()
     game_server.terminate()
-    game_server.join()
+    await loop.run_in_executor(None, game_server.join)
     del game_server
 
-    game_server = start_server()
+    game_server = await loop.run_in_executor(None, start_server)
     listener_client = create_listener_client()
-    run_listener(game_server, listener_client)
+    await run_listener(game_server, listener_client)
 
-if __name__ == "__main__":
-    game_server = start_server()
+async def main():
+    loop = asyncio.get_running_loop()
+    game_server = await loop.run_in_executor(None, start_server)
     listener_client = create_listener_client()
-    run_listener(game_server, listener_client)
+    await run_listener(game_server, listener_client)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -14,14 +14,18 @@ import orbit_defender2d.king_of_the_hill.game_server as GS
 from copy import deepcopy
 from orbit_defender2d.king_of_the_hill import koth
 from orbit_defender2d.king_of_the_hill.examples.server_utils import \
-    assert_valid_game_state, print_game_info
+    assert_valid_game_state, print_game_info, recv_msg, LazyPirateReq, \
+    ROUTER_PORT_NUM, ROUTER_ADDR, PUB_ADDR, CLIENT_SOCKET_OPTIONS, server_comm_configs
 from numpy.random import choice, rand, shuffle
 from time import sleep
-ROUTER_PORT_NUM = 5555
-PUB_PORT_NUM = 5556
+SUB_POLL_TIMEOUT = 200   # [ms]
 #API_VER_NUM_2P = "v2021.11.18.0000.2p"
 API_VER_NUM_2P = "v2022.07.26.0000.2p"
 ECHO_REQ_MSG_0 = {'context': 'echo', 'data': {'key0': 'value0'}}
+
+# expected reply contexts and kinds to game action requests
+_VALID_CONTEXTS = frozenset((GS.DRIFT_PHASE, GS.MOVE_PHASE, GS.ENGAGE_PHASE))
+_VALID_KINDS = frozenset((GS.WAITING_RESP, GS.ADVANCING_RESP))
 # Game Parameters
 GAME_PARAMS = koth.KOTHGameInputArgs(
     max_ring=DGP.MAX_RING,
@@ -46,7 +50,7 @@ GAME_PARAMS = koth.KOTHGameInputArgs(
 #Define the AI player client 
 class PlayerClient(object):
     '''bundles REQ and SUB sockets in one object'''
-    def __init__(self, router_addr, pub_addr, plr_alias, sub_topic=''):
+    def __init__(self, router_addr, pub_addr, plr_alias, sub_topic='', ctx=None):
         ''' Create req and sub socket, and a thread for subsciption handling
         Args:
             router_addr : str
@@ -57,6 +61,9 @@ class PlayerClient(object):
                 alias used for registered player in KOTH game
             sub_topic : str
                 topic for SUB subscription
+            ctx : zmq.Context
+                context in which to create sockets. Defaults to the process-wide
+                shared instance so that clients in one process share I/O threads
 
         Notes:
             Want to use threads, not multiple processes, because I wanted shared memory objects
@@ -68,42 +75,55 @@ class PlayerClient(object):
 
         super().__init__()
 
-        ctx = zmq.Context()
+        if ctx is None:
+            ctx = zmq.Context.instance()
         self.alias = plr_alias
         self.player_id = None
         self.game_state = None
-        self._lock = threading.Lock()
+        self._my_tokens = []
+        # fields common to every request, completed with player UUID at registration
+        self._req_template = {'apiVersion': API_VER_NUM_2P, 'playerAlias': plr_alias}
+        # guards game state updates and notifies threads waiting on them
+        self._cv = threading.Condition()
         self._stop = threading.Event()
 
         # establish REQ socket and connect to ROUTER
-        self.req_socket = ctx.socket(zmq.REQ)
-        self.req_socket.connect(router_addr)
+        self._req = LazyPirateReq(ctx, router_addr, CLIENT_SOCKET_OPTIONS, name=plr_alias)
 
         # establish SUB socket and connect to PUB
         self.sub_socket = ctx.socket(zmq.SUB)
+        for opt, val in CLIENT_SOCKET_OPTIONS.items():
+            self.sub_socket.setsockopt(opt, val)
         # must set a subscription, missing this step is a common mistake. 
         # https://zguide.zeromq.org/docs/chapter1/#Getting-the-Message-Out
         self.sub_socket.setsockopt_string(zmq.SUBSCRIBE, sub_topic) 
+        # only the latest game state matters, keep just the newest (single-frame) message
+        self.sub_socket.setsockopt(zmq.CONFLATE, 1)
         self.sub_socket.connect(pub_addr)
 
+        # poll SUB socket so subscription thread sleeps until a message arrives
+        self._poller = zmq.Poller()
+        self._poller.register(self.sub_socket, zmq.POLLIN)
+
         # establish subscription thread
         # make daemon so it is killed when __main__ ends
         # sub_thread = threading.Thread(target=self.subscriber_func, daemon=True)
         sub_thread = threading.Thread(target=self.subscriber_func)
         sub_thread.start()
 
+    def request(self, req_msg):
+        '''send request to game server and return reply, see LazyPirateReq'''
+        return self._req.request(req_msg)
+
     def register_player_req(self):
         '''format player registration request, send req, recv response, and check'''
 
         # format registration request message
-        req_msg = dict()
-        req_msg['apiVersion'] = API_VER_NUM_2P
+        req_msg = self._req_template.copy()
         req_msg['context'] = 'playerRegistration'
-        req_msg['playerAlias'] = self.alias
 
         # send registration request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        rep_msg = self.request(req_msg)
 
         # check registration successful
         assert rep_msg['apiVersion'] == API_VER_NUM_2P
@@ -117,6 +137,7 @@ class PlayerClient(object):
         # record backend player id
         self.player_id = rep_msg[GS.DATA][GS.PLAYER_ID]
         self.player_uuid = rep_msg[GS.DATA][GS.PLAYER_UUID]
+        self._req_template['playerUUID'] = self.player_uuid
     
     def assert_consistent_registry(self, registry):
         '''check that registry has not changed unexpectedly'''
@@ -129,28 +150,21 @@ class PlayerClient(object):
         '''format game reset request, send request, recv response, and check'''
 
         # format game reset request message
-        req_msg = dict()
-        req_msg['apiVersion'] = API_VER_NUM_2P
+        req_msg = self._req_template.copy()
         req_msg['context'] = 'gameReset'
-        req_msg['playerAlias'] = self.alias
-        req_msg['playerUUID'] = self.player_uuid
 
         # send game reset request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        rep_msg = self.request(req_msg)
 
         # check reset waiting or advancing
         assert rep_msg['apiVersion'] == API_VER_NUM_2P
         assert rep_msg['context'] == 'gameReset'
-        assert rep_msg['data']['kind'] in ['waitingResponse', 'advancingResponse']
+        assert rep_msg['data']['kind'] in _VALID_KINDS
         assert 'error' not in rep_msg.keys()
 
     def send_random_action_req(self, context):
         ''' format and send random-yet-legal action depending on context '''
-        req_msg = dict()
-        req_msg['apiVersion'] = API_VER_NUM_2P
-        req_msg['playerAlias'] = self.alias
-        req_msg['playerUUID'] = self.player_uuid
+        req_msg = self._req_template.copy()
 
         if context == U.DRIFT:
             req_msg['context'] = 'driftPhase'
@@ -159,12 +173,13 @@ class PlayerClient(object):
             # select random valid action formatted as client request dictionary
             plr_actions = []
             req_msg[GS.DATA] = dict()
-            for tok in self.game_state[GS.TOKEN_STATES]:
-                if koth.parse_token_id(tok[GS.PIECE_ID])[0] == self.player_id:
-                    #act = tok[GS.LEGAL_ACTIONS][choice(len(tok[GS.LEGAL_ACTIONS]))]
-                    act = tok[GS.LEGAL_ACTIONS][0]
-                    act[GS.PIECE_ID] = tok[GS.PIECE_ID]
-                    plr_actions.append(act)
+            PIECE_ID = GS.PIECE_ID
+            LEGAL_ACTIONS = GS.LEGAL_ACTIONS
+            for tok in self._my_tokens:
+                #act = tok[LEGAL_ACTIONS][choice(len(tok[LEGAL_ACTIONS]))]
+                # copy selected action, legal actions belong to the received game state
+                act = {**tok[LEGAL_ACTIONS][0], PIECE_ID: tok[PIECE_ID]}
+                plr_actions.append(act)
 
             if context == U.MOVEMENT:
                 req_msg[GS.CONTEXT] = GS.MOVE_PHASE
@@ -180,42 +195,52 @@ class PlayerClient(object):
                 raise ValueError
 
         # send game reset request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        rep_msg = self.request(req_msg)
 
         # check reset waiting or advancing
         assert rep_msg[GS.API_VERSION] == API_VER_NUM_2P
-        assert rep_msg[GS.CONTEXT] in [GS.DRIFT_PHASE, GS.MOVE_PHASE, GS.ENGAGE_PHASE]
+        assert rep_msg[GS.CONTEXT] in _VALID_CONTEXTS
         assert 'error' not in rep_msg.keys(), "error received: {}".format(rep_msg[GS.ERROR][GS.MESSAGE])
-        assert rep_msg[GS.DATA][GS.KIND] in [GS.WAITING_RESP, GS.ADVANCING_RESP]
+        assert rep_msg[GS.DATA][GS.KIND] in _VALID_KINDS
             
 
     def drift_phase_req(self):
         '''format drift request, send msg, recv response, and check'''
 
         # format drift request
-        req_msg = dict()
-        req_msg['apiVersion'] = API_VER_NUM_2P
+        req_msg = self._req_template.copy()
         req_msg['context'] = 'driftPhase'
-        req_msg['playerAlias'] = self.alias
-        req_msg['playerUUID'] = self.player_uuid
 
         # send drift request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        rep_msg = self.request(req_msg)
 
         # check reset waiting or advancing
         assert rep_msg['apiVersion'] == API_VER_NUM_2P
         assert rep_msg['context'] == 'driftPhase'
-        assert rep_msg['data']['kind'] in ['waitingResponse', 'advancingResponse']
+        assert rep_msg['data']['kind'] in _VALID_KINDS
         assert 'error' not in rep_msg.keys()
 
 
+    def wait_for_game_state(self, predicate, timeout=None):
+        '''block until predicate(game_state) is true or timeout expires
+
+        Args:
+            predicate : callable
+                function of the latest published game state (may be None)
+            timeout : float
+                max seconds to wait, None waits indefinitely
+
+        Returns:
+            bool : last evaluation of predicate (False if timed out)
+        '''
+        with self._cv:
+            return self._cv.wait_for(lambda: predicate(self.game_state), timeout=timeout)
+
     def stop(self):
         self._stop.set()
 
     def stopped(self):
-        return self._stop.isSet()
+        return self._stop.is_set()
 
     def subscriber_func(self):
         '''wait for and process message published on PUB
@@ -226,10 +251,11 @@ class PlayerClient(object):
 
         while not self.stopped():
 
-            try:
+            # wait for published message, periodically checking for stop
+            socks = dict(self._poller.poll(timeout=SUB_POLL_TIMEOUT))
+            if self.sub_socket in socks:
 
-                # wait for published message
-                msg = self.sub_socket.recv_json(flags=zmq.NOBLOCK)
+                msg = recv_msg(self.sub_socket)
 
                 # check message content
                 assert msg[GS.API_VERSION] == API_VER_NUM_2P, "expected {}, got {}".format(API_VER_NUM_2P, msg[GS.API_VERSION])
@@ -240,28 +266,30 @@ class PlayerClient(object):
                 if msg[GS.CONTEXT] == GS.PLAYER_REGISTRATION:
                     sleep(0.25)
 
-                # verify registry and update game state (shared memory, therefore use a lock)
-                with self._lock:
-                    self.assert_consistent_registry(msg[GS.DATA][GS.PLAYER_REGISTRY])
-                    self.game_state = msg[GS.DATA][GS.GAME_STATE]
-                    assert_valid_game_state(game_state=self.game_state)
+                # verify registry and new game state
+                self.assert_consistent_registry(msg[GS.DATA][GS.PLAYER_REGISTRY])
+                game_state = msg[GS.DATA][GS.GAME_STATE]
+                # cache this player's tokens once per state update
+                parse, piece, pid = koth.parse_token_id, GS.PIECE_ID, self.player_id
+                my_tokens = [t for t in game_state[GS.TOKEN_STATES] if parse(t[piece])[0] == pid]
+                if __debug__:
+                    assert_valid_game_state(game_state=game_state)
+
+                # update game state shared with other threads and notify waiters
+                with self._cv:
+                    self.game_state = game_state
+                    self._my_tokens = my_tokens
+                    self._cv.notify_all()
 
                 print('{} client received and processed message on SUB!'.format(self.alias))
 
-            except zmq.Again as e:
-                # no messages waiting to be processed
-                pass
-
 
 def run_server_2p_1ran_1remote_game():
     # create game object
-    game = koth.KOTHGame(**GAME_PARAMS._asdict())
+    game = koth.KOTHGame.from_args(GAME_PARAMS)
 
     # create game server
-    comm_configs = {
-        GS.ROUTER_PORT: ROUTER_PORT_NUM,
-        GS.PUB_PORT: PUB_PORT_NUM
-    }
+    comm_configs = server_comm_configs()
     game_server = GS.TwoPlayerGameServer(game=game, comm_configs=comm_configs)
 
     # start game server object
@@ -275,8 +303,8 @@ def run_server_2p_1ran_1remote_game():
     #Create and connect a random player client
     print("Creating alpha client...")
     alpha_client = PlayerClient(
-        router_addr="tcp://localhost:{}".format(ROUTER_PORT_NUM),
-        pub_addr="tcp://localhost:{}".format(PUB_PORT_NUM),
+        router_addr=ROUTER_ADDR,
+        pub_addr=PUB_ADDR,
         plr_alias='harry'
     )
     #Register the alpha player
@@ -286,13 +314,10 @@ def run_server_2p_1ran_1remote_game():
     #Send game reset request and wait for human player to join
     alpha_client.game_reset_req()
 
-    cur_game_state = alpha_client.game_state
-
     #Wait for the human player to connect
-    while cur_game_state is None:
+    while not alpha_client.wait_for_game_state(lambda gs: gs is not None, timeout=5):
         print("Waiting on human player to connect to router port {}".format(ROUTER_PORT_NUM))
-        cur_game_state = alpha_client.game_state
-        sleep(5)
+    cur_game_state = alpha_client.game_state
 
     while not cur_game_state[GS.GAME_DONE]:
         
@@ -303,11 +328,11 @@ def run_server_2p_1ran_1remote_game():
             alpha_client.alias, alpha_client.player_id))
         alpha_client.send_random_action_req(context=cur_game_state[GS.TURN_PHASE])
         
-        # wait for game state to advance
-        while cur_game_state[GS.TURN_PHASE] == turnphase and not cur_game_state[GS.GAME_DONE]:
-            sleep(5)
-            cur_game_state = alpha_client.game_state
-            print('waiting for turn phase {} to advance'.format(cur_game_state[GS.TURN_PHASE]))
+        # wait for game state to advance, woken by the SUB thread on each new game state
+        while not alpha_client.wait_for_game_state(
+            lambda gs: gs[GS.TURN_PHASE] != turnphase or gs[GS.GAME_DONE], timeout=30):
+            print('waiting for turn phase {} to advance'.format(turnphase))
+        cur_game_state = alpha_client.game_state
 
     # cleanup
     print("Terminating server...")
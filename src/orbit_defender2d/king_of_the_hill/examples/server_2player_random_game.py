@@ -3,24 +3,29 @@
 # SPDX-License-Identifier: MIT
 
 import zmq
-import threading
+import zmq.asyncio
+import orjson
+import asyncio
 import orbit_defender2d.utils.utils as U
 import orbit_defender2d.king_of_the_hill.default_game_parameters as DGP
 import orbit_defender2d.king_of_the_hill.game_server as GS
-from copy import deepcopy
+from hashlib import blake2b
 from orbit_defender2d.king_of_the_hill import koth
 from orbit_defender2d.king_of_the_hill.examples.server_utils import \
-    assert_valid_game_state, print_game_info
+    assert_valid_game_state, print_game_info, recv_msg_async, report_task_failure, LazyPirateReq, \
+    ROUTER_PORT_NUM, ROUTER_ADDR, PUB_ADDR, CLIENT_SOCKET_OPTIONS, KOTH_FAST, \
+    server_comm_configs
 from numpy.random import choice, rand, shuffle
-from time import sleep
-
-ROUTER_PORT_NUM = 5555
-PUB_PORT_NUM = 5556
+from random import randrange
 
 API_VER_NUM_2P = "v2022.07.26.0000.2p"
 
 ECHO_REQ_MSG_0 = {'context': 'echo', 'data': {'key0': 'value0'}}
 
+# expected reply contexts and kinds to game action requests
+_VALID_CONTEXTS = frozenset((GS.DRIFT_PHASE, GS.MOVE_PHASE, GS.ENGAGE_PHASE))
+_VALID_KINDS = frozenset((GS.WAITING_RESP, GS.ADVANCING_RESP))
+
 # Game Parameters
 GAME_PARAMS = koth.KOTHGameInputArgs(
     max_ring=DGP.MAX_RING,
@@ -42,10 +47,19 @@ GAME_PARAMS = koth.KOTHGameInputArgs(
     fuel_points_factor_bludger=DGP.FUEL_POINTS_FACTOR_BLUDGER,
     )
 
+def game_state_digest(game_state):
+    '''content hash of game state, equal for equal game states regardless of key order'''
+    return blake2b(orjson.dumps(game_state, option=orjson.OPT_SORT_KEYS), digest_size=32).digest()
+
+async def _delayed(delay, aw):
+    '''await aw after delay seconds'''
+    await asyncio.sleep(delay)
+    return await aw
+
 class PlayerClient(object):
     '''bundles REQ and SUB sockets in one object'''
-    def __init__(self, router_addr, pub_addr, plr_alias, sub_topic=''):
-        ''' Create req and sub socket, and a thread for subsciption handling
+    def __init__(self, router_addr, pub_addr, plr_alias, sub_topic='', ctx=None):
+        ''' Create req and sub socket, and a task for subsciption handling
         Args:
             router_addr : str
                 IP+port number for connection to server ROUTER
@@ -55,53 +69,74 @@ class PlayerClient(object):
                 alias used for registered player in KOTH game
             sub_topic : str
                 topic for SUB subscription
+            ctx : zmq.asyncio.Context
+                context in which to create sockets. Defaults to the process-wide
+                shared instance so that clients in one process share I/O threads
 
         Notes:
-            Want to use threads, not multiple processes, because I wanted shared memory objects
+            Must be instantiated from within a running asyncio event loop.
+            Requests and subscription handling share one thread, so no lock 
+            is needed around the game state
         
         Refs:
-            https://realpython.com/intro-to-python-threading/
-            https://stackoverflow.com/questions/24843193/stopping-a-python-thread-running-an-infinite-loop
+            https://pyzmq.readthedocs.io/en/latest/api/zmq.asyncio.html
         '''
 
         super().__init__()
 
-        ctx = zmq.Context()
+        if ctx is None:
+            ctx = zmq.asyncio.Context.instance()
         self.alias = plr_alias
         self.player_id = None
         self.game_state = None
-        self._lock = threading.Lock()
-        self._stop = threading.Event()
+        self._my_tokens = []
+        # fields common to every request, completed with player UUID at registration
+        self._req_template = {'apiVersion': API_VER_NUM_2P, 'playerAlias': plr_alias}
+        self.game_state_hash = None
+        # notified by subscription task whenever game state is updated
+        self._cv = asyncio.Condition()
 
         # establish REQ socket and connect to ROUTER
-        self.req_socket = ctx.socket(zmq.REQ)
-        self.req_socket.connect(router_addr)
+        self._req = LazyPirateReq(ctx, router_addr, CLIENT_SOCKET_OPTIONS, name=plr_alias)
 
         # establish SUB socket and connect to PUB
         self.sub_socket = ctx.socket(zmq.SUB)
+        for opt, val in CLIENT_SOCKET_OPTIONS.items():
+            self.sub_socket.setsockopt(opt, val)
         # must set a subscription, missing this step is a common mistake. 
         # https://zguide.zeromq.org/docs/chapter1/#Getting-the-Message-Out
         self.sub_socket.setsockopt_string(zmq.SUBSCRIBE, sub_topic) 
+        # only the latest game state matters, keep just the newest (single-frame) message
+        self.sub_socket.setsockopt(zmq.CONFLATE, 1)
         self.sub_socket.connect(pub_addr)
 
-        # establish subscription thread
-        # make daemon so it is killed when __main__ ends
-        # sub_thread = threading.Thread(target=self.subscriber_func, daemon=True)
-        sub_thread = threading.Thread(target=self.subscriber_func)
-        sub_thread.start()
+        # establish subscription task on the running event loop
+        self._sub_task = asyncio.create_task(self.subscriber_coro())
+        self._sub_task.add_done_callback(self._on_subscriber_done)
+
+    def _on_subscriber_done(self, task):
+        '''report a failed subscription task and wake game state waiters so they can re-raise it'''
+        report_task_failure(task)
+        if not task.cancelled():
+            asyncio.ensure_future(self._notify_game_state_waiters())
 
-    def register_player_req(self):
+    async def _notify_game_state_waiters(self):
+        async with self._cv:
+            self._cv.notify_all()
+
+    async def request(self, req_msg):
+        '''send request to game server and return reply, see LazyPirateReq'''
+        return await self._req.request_async(req_msg)
+
+    async def register_player_req(self):
         '''format player registration request, send req, recv response, and check'''
 
         # format registration request message
-        req_msg = dict()
-        req_msg['apiVersion'] = API_VER_NUM_2P
+        req_msg = self._req_template.copy()
         req_msg['context'] = 'playerRegistration'
-        req_msg['playerAlias'] = self.alias
 
         # send registration request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        rep_msg = await self.request(req_msg)
 
         # check registration successful
         assert rep_msg['apiVersion'] == API_VER_NUM_2P
@@ -115,6 +150,7 @@ class PlayerClient(object):
         # record backend player id
         self.player_id = rep_msg[GS.DATA][GS.PLAYER_ID]
         self.player_uuid = rep_msg[GS.DATA][GS.PLAYER_UUID]
+        self._req_template['playerUUID'] = self.player_uuid
     
     def assert_consistent_registry(self, registry):
         '''check that registry has not changed unexpectedly'''
@@ -123,32 +159,25 @@ class PlayerClient(object):
         reg_entry = reg_entry[0]
         assert reg_entry[GS.PLAYER_ID] == self.player_id, "Expect ID {}, got {}".format(self.player_id, reg_entry[GS.PLAYER_ID])
 
-    def game_reset_req(self):
+    async def game_reset_req(self):
         '''format game reset request, send request, recv response, and check'''
 
         # format game reset request message
-        req_msg = dict()
-        req_msg['apiVersion'] = API_VER_NUM_2P
+        req_msg = self._req_template.copy()
         req_msg['context'] = 'gameReset'
-        req_msg['playerAlias'] = self.alias
-        req_msg['playerUUID'] = self.player_uuid
 
         # send game reset request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        rep_msg = await self.request(req_msg)
 
         # check reset waiting or advancing
         assert rep_msg['apiVersion'] == API_VER_NUM_2P
         assert rep_msg['context'] == 'gameReset'
-        assert rep_msg['data']['kind'] in ['waitingResponse', 'advancingResponse']
+        assert rep_msg['data']['kind'] in _VALID_KINDS
         assert 'error' not in rep_msg.keys()
 
-    def send_random_action_req(self, context):
+    async def send_random_action_req(self, context):
         ''' format and send random-yet-legal action depending on context '''
-        req_msg = dict()
-        req_msg['apiVersion'] = API_VER_NUM_2P
-        req_msg['playerAlias'] = self.alias
-        req_msg['playerUUID'] = self.player_uuid
+        req_msg = self._req_template.copy()
 
         if context == U.DRIFT:
             req_msg['context'] = 'driftPhase'
@@ -157,11 +186,13 @@ class PlayerClient(object):
             # select random valid action formatted as client request dictionary
             plr_actions = []
             req_msg[GS.DATA] = dict()
-            for tok in self.game_state[GS.TOKEN_STATES]:
-                if koth.parse_token_id(tok[GS.PIECE_ID])[0] == self.player_id:
-                    act = tok[GS.LEGAL_ACTIONS][choice(len(tok[GS.LEGAL_ACTIONS]))]
-                    act[GS.PIECE_ID] = tok[GS.PIECE_ID]
-                    plr_actions.append(act)
+            PIECE_ID = GS.PIECE_ID
+            LEGAL_ACTIONS = GS.LEGAL_ACTIONS
+            for tok in self._my_tokens:
+                legal_actions = tok[LEGAL_ACTIONS]
+                # copy selected action, legal actions belong to the received game state
+                act = {**legal_actions[randrange(len(legal_actions))], PIECE_ID: tok[PIECE_ID]}
+                plr_actions.append(act)
 
             if context == U.MOVEMENT:
                 req_msg[GS.CONTEXT] = GS.MOVE_PHASE
@@ -177,89 +208,114 @@ class PlayerClient(object):
                 raise ValueError
 
         # send game reset request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        rep_msg = await self.request(req_msg)
 
         # check reset waiting or advancing
         assert rep_msg[GS.API_VERSION] == API_VER_NUM_2P
-        assert rep_msg[GS.CONTEXT] in [GS.DRIFT_PHASE, GS.MOVE_PHASE, GS.ENGAGE_PHASE]
+        assert rep_msg[GS.CONTEXT] in _VALID_CONTEXTS
         assert 'error' not in rep_msg.keys(), "error received: {}".format(rep_msg[GS.ERROR][GS.MESSAGE])
-        assert rep_msg[GS.DATA][GS.KIND] in [GS.WAITING_RESP, GS.ADVANCING_RESP]
+        assert rep_msg[GS.DATA][GS.KIND] in _VALID_KINDS
             
 
-    def drift_phase_req(self):
+    async def drift_phase_req(self):
         '''format drift request, send msg, recv response, and check'''
 
         # format drift request
-        req_msg = dict()
-        req_msg['apiVersion'] = API_VER_NUM_2P
+        req_msg = self._req_template.copy()
         req_msg['context'] = 'driftPhase'
-        req_msg['playerAlias'] = self.alias
-        req_msg['playerUUID'] = self.player_uuid
 
         # send drift request
-        self.req_socket.send_json(req_msg)
-        rep_msg = self.req_socket.recv_json()
+        rep_msg = await self.request(req_msg)
 
         # check reset waiting or advancing
         assert rep_msg['apiVersion'] == API_VER_NUM_2P
         assert rep_msg['context'] == 'driftPhase'
-        assert rep_msg['data']['kind'] in ['waitingResponse', 'advancingResponse']
+        assert rep_msg['data']['kind'] in _VALID_KINDS
         assert 'error' not in rep_msg.keys()
 
 
+    async def wait_for_game_state(self, predicate, timeout=None):
+        '''wait until predicate(game_state) is true or timeout expires
+
+        Args:
+            predicate : callable
+                function of the latest published game state (may be None)
+            timeout : float
+                max seconds to wait, None waits indefinitely
+
+        Returns:
+            bool : last evaluation of predicate (False if timed out)
+
+        Raises the exception of the subscription task if it failed while waiting
+        '''
+        sub_task = self._sub_task
+        async with self._cv:
+            try:
+                await asyncio.wait_for(
+                    self._cv.wait_for(lambda: sub_task.done() or predicate(self.game_state)), 
+                    timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        if sub_task.done() and not sub_task.cancelled():
+            # game state will not be updated anymore, raise the subscription task's exception
+            sub_task.result()
+        return predicate(self.game_state)
+
     def stop(self):
-        self._stop.set()
+        self._sub_task.cancel()
+
+    def close(self):
+        '''stop subscription and close sockets, leaving the (shared) context alive'''
+        self.stop()
+        self._req.close(linger=0)
+        self.sub_socket.close(linger=0)
 
     def stopped(self):
-        return self._stop.isSet()
+        return self._sub_task.done()
 
-    def subscriber_func(self):
+    async def subscriber_coro(self):
         '''wait for and process message published on PUB
         
         Refs:
-            https://stackoverflow.com/questions/26012132/zero-mq-socket-recv-call-is-blocking
+            https://pyzmq.readthedocs.io/en/latest/api/zmq.asyncio.html
         '''
 
-        while not self.stopped():
-
-            try:
-
-                # wait for published message
-                msg = self.sub_socket.recv_json(flags=zmq.NOBLOCK)
+        while True:
 
-                # check message content
-                assert msg[GS.API_VERSION] == API_VER_NUM_2P, "expected {}, got {}".format(API_VER_NUM_2P, msg[GS.API_VERSION])
-                assert GS.ERROR not in msg.keys()
+            # wait for published message
+            msg = await recv_msg_async(self.sub_socket)
 
-                # if registry response, wait a little while for request socket in other thread to 
-                # to have time to receive registry info and update client info
-                if msg[GS.CONTEXT] == GS.PLAYER_REGISTRATION:
-                    sleep(0.25)
+            # check message content
+            assert msg[GS.API_VERSION] == API_VER_NUM_2P, "expected {}, got {}".format(API_VER_NUM_2P, msg[GS.API_VERSION])
+            assert GS.ERROR not in msg.keys()
 
-                # verify registry and update game state (shared memory, therefore use a lock)
-                with self._lock:
-                    self.assert_consistent_registry(msg[GS.DATA][GS.PLAYER_REGISTRY])
-                    self.game_state = msg[GS.DATA][GS.GAME_STATE]
-                    assert_valid_game_state(game_state=self.game_state)
+            # if registry response, wait a little while for request coroutine to 
+            # to have time to receive registry info and update client info
+            if msg[GS.CONTEXT] == GS.PLAYER_REGISTRATION:
+                await asyncio.sleep(0.25)
 
-                print('{} client received and processed message on SUB!'.format(self.alias))
+            # verify registry and update game state
+            self.assert_consistent_registry(msg[GS.DATA][GS.PLAYER_REGISTRY])
+            self.game_state = msg[GS.DATA][GS.GAME_STATE]
+            # cache this player's tokens once per state update
+            parse, piece, pid = koth.parse_token_id, GS.PIECE_ID, self.player_id
+            self._my_tokens = [t for t in self.game_state[GS.TOKEN_STATES] 
+                if parse(t[piece])[0] == pid]
+            self.game_state_hash = game_state_digest(self.game_state)
+            if __debug__ and not KOTH_FAST:
+                assert_valid_game_state(game_state=self.game_state)
+            async with self._cv:
+                self._cv.notify_all()
 
-            except zmq.Again as e:
-                # no messages waiting to be processed
-                pass
+            print('{} client received and processed message on SUB!'.format(self.alias))
 
 
-def run_server_2player_random_game():
-
+def start_server():
     # create game object
-    game = koth.KOTHGame(**GAME_PARAMS._asdict())
+    game = koth.KOTHGame.from_args(GAME_PARAMS)
 
     # create game server
-    comm_configs = {
-        GS.ROUTER_PORT: ROUTER_PORT_NUM,
-        GS.PUB_PORT: PUB_PORT_NUM
-    }
+    comm_configs = server_comm_configs()
     game_server = GS.TwoPlayerGameServer(game=game, comm_configs=comm_configs)
 
     # start game server object
@@ -270,22 +326,28 @@ def run_server_2player_random_game():
     # trick yourself into thinking they are the same object
     del game
 
+    return game_server
+
+async def play_server_2player_random_game():
+    '''start game server, connect two random-action clients, and play one game to completion'''
+
+    # blocking process calls are run in the default executor to keep the event loop free
+    # (this also keeps the forked server process from inheriting the running loop)
+    loop = asyncio.get_running_loop()
+    game_server = await loop.run_in_executor(None, start_server)
+
     # create and connect players' client
     print("Creating alpha client...")
-    # alpha_client = context.socket(zmq.REQ)
-    # alpha_client.connect("tcp://localhost:{}".format(ROUTER_PORT_NUM))
     alpha_client = PlayerClient(
-        router_addr="tcp://localhost:{}".format(ROUTER_PORT_NUM),
-        pub_addr="tcp://localhost:{}".format(PUB_PORT_NUM),
+        router_addr=ROUTER_ADDR,
+        pub_addr=PUB_ADDR,
         plr_alias='harry'
     )
 
     print("Creating beta client...")
-    # beta_client = context.socket(zmq.REQ)
-    # beta_client.connect("tcp://localhost:{}".format(ROUTER_PORT_NUM))
     beta_client = PlayerClient(
-        router_addr="tcp://localhost:{}".format(ROUTER_PORT_NUM),
-        pub_addr="tcp://localhost:{}".format(PUB_PORT_NUM),
+        router_addr=ROUTER_ADDR,
+        pub_addr=PUB_ADDR,
         plr_alias='draco'
     )
 
@@ -294,58 +356,53 @@ def run_server_2player_random_game():
     for i in range(3):
         rnd_client = choice([alpha_client, beta_client])
         print("Sending echo message {} from client alias {}".format(i, rnd_client.alias))
-        rnd_client.req_socket.send_json(ECHO_REQ_MSG_0)
-        rep_msg = rnd_client.req_socket.recv_json()
+        rep_msg = await rnd_client.request(ECHO_REQ_MSG_0)
         assert rep_msg == ECHO_REQ_MSG_0
 
     # register clients as players in order, with random time between the two
     print("Registering alpha client with alias {}...".format(alpha_client.alias))
-    alpha_client.register_player_req()
-    sleep(rand())
+    await alpha_client.register_player_req()
+    await asyncio.sleep(rand())
     print("Registering beta client with alias {}...".format(beta_client.alias))
-    beta_client.register_player_req()
+    await beta_client.register_player_req()
 
     # Initialize game
     # send game reset requests in random order with random delay
     clis = [alpha_client, beta_client]
     shuffle(clis)
     print("Resetting game...")
-    clis[0].game_reset_req()
-    sleep(0.1*rand())
-    clis[1].game_reset_req()
+    await asyncio.gather(
+        clis[0].game_reset_req(),
+        _delayed(0.1*rand(), clis[1].game_reset_req()))
 
-    def get_and_verify_game_state():
+    async def get_and_verify_game_state(prev_game_state=None, timeout=30):
         # check that both clients recieved the same game state
-        # try a few times to make sure both client threads have had 
-        # a chance to update
-        attempt = 0
-        while True:
-            attempt += 1
-            print("Attempt {} to sync game states...".format(attempt))
-            sleep(0.01)
-            with clis[0]._lock:
-                gs = deepcopy(clis[0].game_state)
-
-            if gs is None:
-                print("Waiting for non-empty game state...")
-                sleep(0.5)
-                continue
-
-            with clis[1]._lock:
-                if gs == clis[1].game_state:
-                    print("Matching game state confirmed!")
-                    break
-                else:
-                    if attempt >= 5:
-                        raise ValueError("Unable to sync game states after {} attempts".format(attempt))
+        # wait until each client task has been notified of a game state
+        # newer than prev_game_state (phase advances or game ends between calls)
+        def state_key(gs):
+            return (gs[GS.TURN_NUMBER], gs[GS.TURN_PHASE], gs[GS.GAME_DONE])
+
+        prev_key = None if prev_game_state is None else state_key(prev_game_state)
+
+        def advanced(gs):
+            return gs is not None and state_key(gs) != prev_key
+
+        if not await clis[0].wait_for_game_state(advanced, timeout=timeout):
+            raise ValueError("No new game state received after {} seconds".format(timeout))
+        gs, gs_hash = clis[0].game_state, clis[0].game_state_hash
+
+        if not await clis[1].wait_for_game_state(lambda _: clis[1].game_state_hash == gs_hash, timeout=timeout):
+            raise ValueError("Unable to sync game states after {} seconds".format(timeout))
+        print("Matching game state confirmed!")
 
         return gs
     
     # check that both clients recieved the same game state
-    cur_game_state = get_and_verify_game_state()
+    cur_game_state = await get_and_verify_game_state()
 
     print("\n<==== GAME INITILIZATION ====>")
-    print_game_info(game_state=cur_game_state)
+    if not KOTH_FAST:
+        print_game_info(game_state=cur_game_state)
 
     while not cur_game_state[GS.GAME_DONE]:
     # for iii in range(10):
@@ -357,28 +414,28 @@ def run_server_2player_random_game():
 
         # send random, legal, context-dependent action from each client
         # with randomized wait time between
-        print('{} ({}) client sending action request. Waiting on {} ({}) client...'.format(
+        print('{} ({}) client sending action request. {} ({}) client sending after random delay...'.format(
             clis[0].alias, clis[0].player_id, clis[1].alias, clis[1].player_id))
-        clis[0].send_random_action_req(context=cur_game_state[GS.TURN_PHASE])
-        sleep(rand())
-        print('{} ({}) client sending action request.'.format(clis[1].alias, clis[1].player_id))
-        clis[1].send_random_action_req(context=cur_game_state[GS.TURN_PHASE])
+        await asyncio.gather(
+            clis[0].send_random_action_req(context=cur_game_state[GS.TURN_PHASE]),
+            _delayed(rand(), clis[1].send_random_action_req(context=cur_game_state[GS.TURN_PHASE])))
 
         # check that both clients recieved the same game state
-        cur_game_state = get_and_verify_game_state()
+        cur_game_state = await get_and_verify_game_state(prev_game_state=cur_game_state)
 
-        print_game_info(game_state=cur_game_state)
+        if not KOTH_FAST:
+            print_game_info(game_state=cur_game_state)
 
     # cleanup
     print("Terminating server...")
     game_server.terminate()
-    game_server.join()
+    await loop.run_in_executor(None, game_server.join)
 
-    print("Stopping {} ({}) client thread...".format(alpha_client.alias, alpha_client.player_id))
-    alpha_client.stop()
+    print("Stopping {} ({}) client...".format(alpha_client.alias, alpha_client.player_id))
+    alpha_client.close()
 
-    print("Stopping {} ({}) client thread...".format(beta_client.alias, beta_client.player_id))
-    beta_client.stop()
+    print("Stopping {} ({}) client...".format(beta_client.alias, beta_client.player_id))
+    beta_client.close()
 
     winner_id = None
     winner_alias = None
@@ -400,5 +457,8 @@ def run_server_2player_random_game():
         "Score: {}|{}\n".format(alpha_score, beta_score) + 
         "=====================\n")
 
+def run_server_2player_random_game():
+    asyncio.run(play_server_2player_random_game())
+
 if __name__ == "__main__":
     run_server_2player_random_game()
@@ -1,5 +1,6 @@
 import zmq
 import time
+import signal
 import threading
 import orbit_defender2d.utils.utils as U
 import orbit_defender2d.king_of_the_hill.default_game_parameters as DGP
@@ -43,7 +44,7 @@ GAME_PARAMS = koth.KOTHGameInputArgs(
 def run_server_2player_remote_game():
 
     # create game object
-    game = koth.KOTHGame(**GAME_PARAMS._asdict())
+    game = koth.KOTHGame.from_args(GAME_PARAMS)
 
     # create game server
     comm_configs = {
@@ -65,10 +66,11 @@ def run_server_2player_remote_game():
     # alpha_client = context.socket(zmq.REQ)
     # alpha_client.connect("tcp://localhost:{}".format(ROUTER_PORT_NUM))
 
-    while 1 > 0:
-        # for iii in range(10):
-        print("I think I am still running and handling stuff...")
-        time.sleep(5)
+    # sleep until interrupted (Ctrl+C), then shut the server down
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    print("Server running, press Ctrl+C to stop")
+    stop.wait()
 
     # cleanup
     print("Terminating server...")
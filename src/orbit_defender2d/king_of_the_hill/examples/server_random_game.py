@@ -6,15 +6,18 @@
 # using a game server and agent clients 
 # with random-yet-valid agents 
 
+import sys
 from multiprocessing import Value
 import zmq
+import numpy as np
 import orbit_defender2d.utils.utils as U
 import orbit_defender2d.king_of_the_hill.game_server as GS
 import orbit_defender2d.king_of_the_hill.default_game_parameters as DGP
 from orbit_defender2d.king_of_the_hill import koth
 from orbit_defender2d.king_of_the_hill.examples.server_utils import \
-    assert_valid_game_state, print_game_info
-from numpy.random import choice
+    assert_valid_game_state, print_game_info, send_msg_dealer, recv_msg_dealer, \
+    send_frame_dealer, SERVER_ADDR, CLIENT_SOCKET_OPTIONS, REQ_TIMEOUT, KOTH_FAST, \
+    single_user_server_comm_configs
 
 GAME_PARAMS = koth.KOTHGameInputArgs(
     max_ring=DGP.MAX_RING,
@@ -36,61 +39,95 @@ GAME_PARAMS = koth.KOTHGameInputArgs(
     fuel_points_factor_bludger=DGP.FUEL_POINTS_FACTOR_BLUDGER,
     )
 
-PORT_NUM = 5555
 API_VER_NUM = 'v2021.11.18.0000.1p'
 
 ECHO_REQ_MSG_0 = {'context': 'echo', 'data': {'key0': 'value0'}}
 
-def get_game_reset_req_msg():
-    return {
-        GS.API_VERSION:API_VER_NUM,
-        GS.CONTEXT:GS.GAME_RESET
-    }
+# per-turn printing is skipped when output is redirected (e.g. batch runs)
+# or KOTH_FAST is set, set True to force it
+VERBOSE = sys.stdout.isatty() and not KOTH_FAST
 
-def get_drift_req_msg():
-    return {
-        GS.API_VERSION:API_VER_NUM,
-        GS.CONTEXT:GS.DRIFT_PHASE
-    }
-
-def format_action_request(rep_game_state, req_actions):
-    '''format verbose action dictionary into JSON request dictionary'''
-
-    req_msg = dict()
-    req_msg[GS.API_VERSION] = API_VER_NUM
-    req_msg[GS.DATA] = dict()
-    if rep_game_state[GS.TURN_PHASE] == U.MOVEMENT:
-        req_msg[GS.CONTEXT] = GS.MOVE_PHASE
-        req_msg[GS.DATA][GS.KIND] = GS.MOVE_PHASE_REQ
-        req_msg[GS.DATA][GS.MOVEMENT_SELECTIONS] = req_actions
-    elif rep_game_state[GS.TURN_PHASE] == U.ENGAGEMENT:
-        req_msg[GS.CONTEXT] = GS.ENGAGE_PHASE
-        req_msg[GS.DATA][GS.KIND] = GS.ENGAGE_PHASE_REQ
-        req_msg[GS.DATA][GS.ENGAGEMENT_SELECTIONS] = req_actions
-    elif rep_game_state[GS.TURN_PHASE] == U.DRIFT:
-        req_msg[GS.CONTEXT] = GS.DRIFT_PHASE
-        req_msg[GS.DATA][GS.KIND] = GS.DRIFT_PHASE_REQ
-    else:
-        raise ValueError("Unrecognized turn phase {}".format(rep_game_state[GS.TURN_PHASE]))
+# action fields sent back to the server, alongside the piece id
+ACTION_FIELDS = (GS.ACTION_TYPE, GS.TARGET_ID)
+
+# draws the random action indices for all tokens in one call per turn
+_RNG = np.random.default_rng()
 
-    return req_msg
+# requests without per-turn content are built once and reused, they are only serialized
+_GAME_RESET_REQ_MSG = {
+    GS.API_VERSION:API_VER_NUM,
+    GS.CONTEXT:GS.GAME_RESET
+}
 
+def _action_req_affixes(context, kind, selections_key):
+    '''serialized json before and after the action selections of a request'''
+    frame = GS.encode_message({
+        GS.API_VERSION:API_VER_NUM,
+        GS.CONTEXT:context,
+        GS.DATA:{GS.KIND:kind, selections_key:None}})
+    prefix, suffix = frame.split(b'null')
+    return prefix, suffix
+
+# action requests only differ by their selections, the surrounding json is 
+# serialized once per phase and only the selections are encoded per turn
+_ACTION_REQ_AFFIXES = {
+    U.MOVEMENT: _action_req_affixes(GS.MOVE_PHASE, GS.MOVE_PHASE_REQ, GS.MOVEMENT_SELECTIONS),
+    U.ENGAGEMENT: _action_req_affixes(GS.ENGAGE_PHASE, GS.ENGAGE_PHASE_REQ, GS.ENGAGEMENT_SELECTIONS),
+}
+_DRIFT_REQ_FRAME = GS.encode_message({
+    GS.API_VERSION:API_VER_NUM,
+    GS.CONTEXT:GS.DRIFT_PHASE
+})
 
-def print_actions(req_actions):
-    print("ACTIONS:")
+def get_game_reset_req_msg():
+    '''shared request dictionary, do not modify'''
+    return _GAME_RESET_REQ_MSG
+
+def encode_action_request(turn_phase, req_actions):
+    '''serialize movement or engagement request for the given turn phase to json bytes'''
+    try:
+        prefix, suffix = _ACTION_REQ_AFFIXES[turn_phase]
+    except KeyError:
+        raise ValueError("Unrecognized turn phase {}".format(turn_phase)) from None
+    return prefix + GS.encode_message(req_actions) + suffix
+
+
+def recv_reply(sock):
+    '''receive reply to the last request, raising if the server errored or did not reply in time'''
+    try:
+        rep_msg = recv_msg_dealer(sock)
+    except zmq.Again:
+        raise TimeoutError("No reply from game server within {} ms".format(REQ_TIMEOUT)) from None
+    if GS.ERROR in rep_msg:
+        raise RuntimeError("Game server returned error: {}".format(rep_msg[GS.ERROR]))
+    return rep_msg
+
+def print_actions(req_actions, buf=None):
+    '''print actions sent to server, or append lines to buf (list) if given'''
+    lines = ["ACTIONS:"]
     if req_actions is None:
-        print("   None")
+        lines.append("   None")
+    else:
+        piece, act_type = GS.PIECE_ID, GS.ACTION_TYPE
+        lines.extend(f"   {act[piece]:<15s} | {act[act_type]}" for act in req_actions)
+    if buf is None:
+        print("\n".join(lines))
     else:
-        for act in req_actions:
-            print("   {:<15s} | {}".format(act[GS.PIECE_ID], act[GS.ACTION_TYPE]))
+        buf.extend(lines)
 
-def run_server_random_game():
+def run_server_random_game(ctx=None):
+    '''
+    Args:
+        ctx : zmq.Context
+            context for the client socket, defaults to the process-wide
+            zmq.Context.instance() so repeated games share one context
+    '''
 
     # create game object
-    game = koth.KOTHGame(**GAME_PARAMS._asdict())
+    game = koth.KOTHGame.from_args(GAME_PARAMS)
 
     # create game server
-    game_server = GS.SingleUserGameServer(game, comm_configs={GS.TCP_PORT: PORT_NUM})
+    game_server = GS.SingleUserGameServer(game, comm_configs=single_user_server_comm_configs())
 
     # start game server object
     game_server.start()
@@ -101,15 +138,23 @@ def run_server_random_game():
     del game
 
     # create and connect players' client
-    context = zmq.Context()
-    players_client = context.socket(zmq.REQ)
-    players_client.connect("tcp://localhost:{}".format(PORT_NUM))
+    # DEALER rather than REQ so that the drift request can be sent 
+    # behind the engagement request without waiting for its reply
+    if ctx is None:
+        ctx = zmq.Context.instance()
+    players_client = ctx.socket(zmq.DEALER)
+    for opt, val in CLIENT_SOCKET_OPTIONS.items():
+        players_client.setsockopt(opt, val)
+    # the server does not reply if it fails to handle a request, don't wait forever
+    players_client.setsockopt(zmq.RCVTIMEO, REQ_TIMEOUT)
+    # connects over ipc when available, see server_utils.SERVER_ADDR
+    players_client.connect(SERVER_ADDR)
 
     # send a turn initilization request to get game started
-    players_client.send_json(get_game_reset_req_msg())
+    send_msg_dealer(players_client, get_game_reset_req_msg())
 
     # get response and check for expected format
-    rep_msg = players_client.recv_json()
+    rep_msg = recv_reply(players_client)
     assert rep_msg[GS.API_VERSION] == API_VER_NUM
     assert rep_msg[GS.CONTEXT] == GS.GAME_RESET
     assert rep_msg[GS.DATA][GS.KIND] == GS.GAME_RESET_RESP
@@ -121,42 +166,59 @@ def run_server_random_game():
     print("\n<==== GAME INITILIZATION ====>")
     print_game_info(game_state=rep_game_state)
 
-    while not rep_msg[GS.DATA][GS.GAME_STATE][GS.GAME_DONE]:
+    # message keys used for every token on every turn, bound once as locals
+    piece, la, ts, tp = GS.PIECE_ID, GS.LEGAL_ACTIONS, GS.TOKEN_STATES, GS.TURN_PHASE
+
+    while not rep_game_state[GS.GAME_DONE]:
     # for iii in range(10):
 
-        print("\n<==== Turn: {} | Phase: {} ====>".format(rep_game_state[GS.TURN_NUMBER], rep_game_state[GS.TURN_PHASE]))
+        # turn phase is looked up once per turn
+        turn_phase = rep_game_state[tp]
+
+        # per-turn output is collected and written once at the end of the turn
+        if VERBOSE:
+            buf = ["\n<==== Turn: {} | Phase: {} ====>".format(rep_game_state[GS.TURN_NUMBER], turn_phase)]
 
-        if rep_game_state[GS.TURN_PHASE] == U.DRIFT:
+        if turn_phase == U.DRIFT:
             req_actions = None
-            req_msg = get_drift_req_msg()
+            req_frame = _DRIFT_REQ_FRAME
 
         else:
             # select random valid action formatted as client request dictionary
             req_actions = []
-            for tok in rep_game_state[GS.TOKEN_STATES]:
-                act = tok[GS.LEGAL_ACTIONS][choice(len(tok[GS.LEGAL_ACTIONS]))]
-                act[GS.PIECE_ID] = tok[GS.PIECE_ID]
+            tokens = rep_game_state[ts]
+            n_legal = np.fromiter((len(tok[la]) for tok in tokens), dtype=np.int64, count=len(tokens))
+            for tok, i in zip(tokens, _RNG.integers(n_legal).tolist()):
+                # build new action dict, legal actions belong to the received game state
+                act = tok[la][i]
+                act = {piece: tok[piece], **{k: act[k] for k in ACTION_FIELDS if k in act}}
                 req_actions.append(act)
 
-            # format action as client request
-            req_msg = format_action_request(rep_game_state, req_actions)
+            # serialize action as client request
+            req_frame = encode_action_request(turn_phase, req_actions)
 
         # send request to game server
-        print_actions(req_actions=req_actions)
-        players_client.send_json(req_msg)
+        if VERBOSE:
+            print_actions(req_actions=req_actions, buf=buf)
+        send_frame_dealer(players_client, req_frame)
 
         # get response and check for validity
-        rep_msg = players_client.recv_json()
+        rep_msg = recv_reply(players_client)
         rep_game_state = rep_msg[GS.DATA][GS.GAME_STATE]
-        assert_valid_game_state(rep_game_state)
+        if __debug__ and not KOTH_FAST:
+            assert_valid_game_state(rep_game_state)
         
         # print game state information
-        print_game_info(game_state=rep_game_state)
+        if VERBOSE:
+            print_game_info(game_state=rep_game_state, buf=buf)
+            buf.append("")
+            sys.stdout.write("\n".join(buf))
 
     # cleanup
     # print("\n====GAME FINISHED====\n=====================\n")
     game_server.terminate()
     game_server.join()
+    players_client.close()
 
     winner = None
     alpha_score = rep_game_state[GS.SCORE_ALPHA]
@@ -2,8 +2,243 @@
 # Subject to FAR 52.227-11 – Patent Rights – Ownership by the Contractor (May 2014).
 # SPDX-License-Identifier: MIT
 
+import os
+import sys
+import traceback
+import zmq
+import orjson
+import asyncio
 import orbit_defender2d.utils.utils as U
 import orbit_defender2d.king_of_the_hill.game_server as GS
+import orbit_defender2d.king_of_the_hill.default_game_parameters as DGP
+
+ROUTER_PORT_NUM = 5555
+PUB_PORT_NUM = 5556
+SERVER_PORT_NUM = 5555  # single user game server
+
+# The server binds both the tcp ports (for remote players) and local endpoints.
+# Co-located clients connect over ipc, avoiding the tcp loopback stack. 
+# ipc is not available on Windows, so fall back to tcp there. 
+# Endpoints can be overridden with the ROUTER_ADDR, PUB_ADDR and SERVER_ADDR environment variables
+if os.name == 'nt':
+    ROUTER_ADDR = os.environ.get("ROUTER_ADDR", "tcp://localhost:{}".format(ROUTER_PORT_NUM))
+    PUB_ADDR = os.environ.get("PUB_ADDR", "tcp://localhost:{}".format(PUB_PORT_NUM))
+    SERVER_ADDR = os.environ.get("SERVER_ADDR", "tcp://localhost:{}".format(SERVER_PORT_NUM))
+else:
+    ROUTER_ADDR = os.environ.get("ROUTER_ADDR", "ipc:///tmp/od2d_router.sock")
+    PUB_ADDR = os.environ.get("PUB_ADDR", "ipc:///tmp/od2d_pub.sock")
+    SERVER_ADDR = os.environ.get("SERVER_ADDR", "ipc:///tmp/od2d_server.sock")
+
+# socket options for client sockets, see GS.DEFAULT_SOCKET_OPTIONS.
+# libzmq sets TCP_NODELAY on its tcp connections, IMMEDIATE only queues 
+# messages on completed connections and keepalives detect dead peers
+CLIENT_SOCKET_OPTIONS = {
+    zmq.SNDHWM: 0,
+    zmq.RCVHWM: 0,
+    zmq.LINGER: 0,
+    zmq.IMMEDIATE: 1,
+    zmq.TCP_KEEPALIVE: 1,
+    zmq.TCP_KEEPALIVE_IDLE: 60,
+}
+
+# KOTH_FAST=1 (or true/yes/on) skips per-turn printing and game state validation in the
+# example clients, e.g. for long batch runs
+KOTH_FAST = os.environ.get("KOTH_FAST", "").strip().lower() in ("1", "true", "yes", "on")
+
+SEND_RETRY_DELAY = 0.1   # [s]
+REQ_TIMEOUT = 30000      # [ms]
+
+def send_msg(sock, d):
+    '''serialize dictionary in the game server wire format and send as a single frame'''
+    sock.send(GS.encode_message(d))
+
+def recv_msg(sock, **kwargs):
+    '''receive a single frame and deserialize with orjson'''
+    return orjson.loads(sock.recv(**kwargs))
+
+def server_comm_configs():
+    '''game server comm_configs binding the tcp ports and, if not tcp, the local ROUTER_ADDR and PUB_ADDR'''
+    comm_configs = {
+        GS.ROUTER_PORT: ROUTER_PORT_NUM,
+        GS.PUB_PORT: PUB_PORT_NUM
+    }
+    if not ROUTER_ADDR.startswith("tcp://"):
+        comm_configs[GS.ROUTER_ADDR] = ROUTER_ADDR
+    if not PUB_ADDR.startswith("tcp://"):
+        comm_configs[GS.PUB_ADDR] = PUB_ADDR
+    return comm_configs
+
+def single_user_server_comm_configs():
+    '''single user game server comm_configs binding the tcp port and, if not tcp, the local SERVER_ADDR'''
+    comm_configs = {GS.TCP_PORT: SERVER_PORT_NUM}
+    if not SERVER_ADDR.startswith("tcp://"):
+        comm_configs[GS.SERVER_ADDR] = SERVER_ADDR
+    return comm_configs
+
+def send_msg_dealer(sock, d):
+    '''send message from DEALER socket with the empty delimiter frame a REP socket expects
+
+    A DEALER can send several requests before receiving, which a REQ socket cannot
+    '''
+    send_frame_dealer(sock, GS.encode_message(d))
+
+def send_frame_dealer(sock, frame):
+    '''send already serialized message bytes from DEALER socket, see send_msg_dealer'''
+    sock.send_multipart([b'', frame])
+
+def recv_msg_dealer(sock, **kwargs):
+    '''receive reply from REP socket on DEALER socket, dropping the empty delimiter frame'''
+    return orjson.loads(sock.recv_multipart(**kwargs)[-1])
+
+async def send_msg_async(sock, d, retries=0):
+    '''serialize dictionary in the game server wire format and send as a single frame on asyncio socket
+
+    Args:
+        sock : zmq.asyncio.Socket
+            socket to send on
+        d : dict
+            message to send
+        retries : int
+            if positive, send without blocking and retry this many times 
+            if the socket is not ready to accept the message (e.g. no connected peer)
+    '''
+    frame = GS.encode_message(d)
+    if retries <= 0:
+        await sock.send(frame)
+        return
+    for _ in range(retries):
+        try:
+            await sock.send(frame, flags=zmq.NOBLOCK)
+            return
+        except zmq.Again:
+            await asyncio.sleep(SEND_RETRY_DELAY)
+    raise zmq.Again("Unable to send message after {} attempts".format(retries))
+
+async def recv_msg_async(sock, **kwargs):
+    '''receive a single frame on asyncio socket and deserialize with orjson'''
+    return orjson.loads(await sock.recv(**kwargs))
+
+def report_task_failure(task):
+    '''done-callback for background tasks, prints the traceback of a task that raised
+
+    Nothing awaits a background task, so its exception would otherwise go unnoticed
+    '''
+    if task.cancelled() or task.exception() is None:
+        return
+    exc = task.exception()
+    print("Background task {} failed:".format(task.get_name()), file=sys.stderr)
+    traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+async def wait_event_or_task(evt, task, timeout=None):
+    '''wait for evt to be set, re-raising the exception of task if it ends first
+
+    Args:
+        evt : asyncio.Event
+            event set by task
+        task : asyncio.Task
+            background task expected to set evt
+        timeout : float
+            max seconds to wait, None waits indefinitely
+
+    Returns:
+        bool : True if evt is set (False if timed out)
+    '''
+    evt_wait = asyncio.ensure_future(evt.wait())
+    try:
+        await asyncio.wait((evt_wait, task), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        evt_wait.cancel()
+    if task.done() and not evt.is_set():
+        # raises the exception of the failed (or CancelledError of the stopped) task
+        task.result()
+    return evt.is_set()
+
+# request contexts that LazyPirateReq resends after a timeout. Game reset and action
+# requests are not resent: the server may have applied a request whose reply was lost,
+# and resending it would queue it twice. A resent registration whose first reply was 
+# lost is rejected by the server as an alias collision rather than applied twice
+RESEND_CONTEXTS = frozenset((GS.ECHO, GS.PLAYER_REGISTRATION))
+
+class LazyPirateReq:
+    '''REQ socket connected to game server ROUTER that resends once if no reply arrives within timeout
+
+    Only requests with a context in RESEND_CONTEXTS are resent, other requests raise 
+    TimeoutError so the caller can decide how to recover
+
+    Use request with a zmq.Context and request_async with a zmq.asyncio.Context
+
+    Refs:
+        https://zguide.zeromq.org/docs/chapter4/#Client-Side-Reliability-Lazy-Pirate-Pattern
+    '''
+    def __init__(self, ctx, router_addr, socket_options=None, timeout=REQ_TIMEOUT, name=''):
+        '''
+        Args:
+            ctx : zmq.Context or zmq.asyncio.Context
+                context used to create (and re-create) the REQ socket
+            router_addr : str
+                address of the game server ROUTER
+            socket_options : dict
+                zmq socket options applied to each new REQ socket
+            timeout : int
+                time to wait for a reply before resending [ms]
+            name : str
+                used to label timeout messages
+        '''
+        self._ctx = ctx
+        self._router_addr = router_addr
+        self._socket_options = socket_options or {}
+        self.timeout = timeout
+        self.name = name
+        self.socket = self._connect()
+
+    def _connect(self):
+        '''create REQ socket connected to server ROUTER
+
+        recv raises zmq.Again rather than waiting forever on a lost reply
+        '''
+        sock = self._ctx.socket(zmq.REQ)
+        for opt, val in self._socket_options.items():
+            sock.setsockopt(opt, val)
+        sock.setsockopt(zmq.RCVTIMEO, self.timeout)
+        sock.connect(self._router_addr)
+        return sock
+
+    def _reconnect(self, req_msg):
+        '''REQ socket cannot send again until it receives, so replace it
+
+        Raises TimeoutError if req_msg is not safe to resend (see RESEND_CONTEXTS)
+        '''
+        self.socket.close()
+        self.socket = self._connect()
+        if req_msg[GS.CONTEXT] not in RESEND_CONTEXTS:
+            raise TimeoutError("{} client received no reply in {} ms to {} request, not resending".format(
+                self.name, self.timeout, req_msg[GS.CONTEXT]))
+        print("{} client received no reply in {} ms, resending request".format(self.name, self.timeout))
+
+    def request(self, req_msg):
+        '''send request and return reply, resending once if no reply within timeout'''
+        send_msg(self.socket, req_msg)
+        try:
+            return recv_msg(self.socket)
+        except zmq.Again:
+            self._reconnect(req_msg)
+            send_msg(self.socket, req_msg)
+            return recv_msg(self.socket)
+
+    async def request_async(self, req_msg):
+        '''send request and return reply, resending once if no reply within timeout'''
+        await send_msg_async(self.socket, req_msg)
+        try:
+            return await recv_msg_async(self.socket)
+        except zmq.Again:
+            self._reconnect(req_msg)
+            await send_msg_async(self.socket, req_msg)
+            return await recv_msg_async(self.socket)
+
+    def close(self, linger=None):
+        self.socket.close(linger=linger)
+
+_TURN_PHASE_SET = frozenset(U.TURN_PHASE_LIST)
 
 def assert_valid_game_state(game_state):
     '''check response from game server gives valid game state
@@ -14,7 +249,7 @@ def assert_valid_game_state(game_state):
     assert game_state[GS.TURN_NUMBER] >= 0
 
     # turn phase
-    assert game_state[GS.TURN_PHASE] in U.TURN_PHASE_LIST
+    assert game_state[GS.TURN_PHASE] in _TURN_PHASE_SET
 
     # game done
     assert isinstance(game_state[GS.GAME_DONE], bool)
@@ -25,45 +260,65 @@ def assert_valid_game_state(game_state):
     assert isinstance(game_state[GS.GOAL_BETA], int)
     # assert 0 < game_state[GS.GOAL_BETA] <= game_board.n_sectors
 
-def print_game_info(game_state):
+_ENGAGEMENT_FMT = "   {:<10s} | {:<16s} | {:<16s} | {:<16s} |---> {}".format
+
+def _fmt_attack_outcome(egout):
+    return _ENGAGEMENT_FMT(egout[GS.ACTION_TYPE], egout[GS.ATTACKER_ID], "", egout[GS.TARGET_ID],
+        "Success" if egout[GS.SUCCESS] else "Failure")
+
+def _fmt_guard_outcome(egout):
+    # guard outcomes only have an attacker if the guardian intercepted an attack
+    attacker = egout[GS.ATTACKER_ID]
+    return _ENGAGEMENT_FMT(egout[GS.ACTION_TYPE], attacker if isinstance(attacker, str) else "",
+        egout[GS.GUARDIAN_ID], egout[GS.TARGET_ID], "Success" if egout[GS.SUCCESS] else "Failure")
+
+# engagement outcome line formatter for each action type
+_ENGAGEMENT_OUTCOME_FMTS = {
+    U.SHOOT: _fmt_attack_outcome,
+    U.COLLIDE: _fmt_attack_outcome,
+    U.GUARD: _fmt_guard_outcome,
+    U.NOOP: lambda egout: "NOOP",
+}
+
+def print_game_info(game_state, buf=None):
     '''
     Print the game state information from the game server.
     This is the game server version of game state, so not compatible with the kothgame game state.
+    If buf (list) is given, the lines are appended to it instead of printed.
     '''
-    print("STATES:")
-    for tok in game_state[GS.TOKEN_STATES]:
-        print("   {:<16s}| position: {:<4d}| fuel: {:<8.1f} ".format(tok[GS.PIECE_ID], tok[GS.POSITION], tok[GS.FUEL]))
-    print(U.P1+" score: {}".format(game_state[GS.SCORE_ALPHA]))
-    print(U.P2+" score: {}".format(game_state[GS.SCORE_BETA]))
+    lines = ["STATES:"]
+    pid, pos, fuel = GS.PIECE_ID, GS.POSITION, GS.FUEL
+    lines.extend(f"   {tok[pid]:<16s}| position: {tok[pos]:<4d}| fuel: {tok[fuel]:<8.1f} " for tok in game_state[GS.TOKEN_STATES])
+    lines.append(U.P1+" score: {}".format(game_state[GS.SCORE_ALPHA]))
+    lines.append(U.P2+" score: {}".format(game_state[GS.SCORE_BETA]))
+    if buf is None:
+        print("\n".join(lines))
+    else:
+        buf.extend(lines)
 
-def print_engagement_outcomes_list(engagement_outcomes, file=None):
+def print_engagement_outcomes_list(engagement_outcomes, file=None, buf=None):
     '''
     The engagement outcomes from the game server are a list of dicts instead of a list of named tuples like the kothgame engagement outcomes.
     See print_engagement_outcomes in koth.py for the kothgame version.
+    If buf (list) is given, the lines are appended to it instead of printed.
     '''
-    print("ENGAGEMENT OUTCOMES:", file=file)
+    lines = ["ENGAGEMENT OUTCOMES:"]
     # if engagement_outcomes is empty print No engagements
     if not engagement_outcomes:
-        print("    No engagements", file=file)
+        lines.append("    No engagements")
     else:
         # print the engagement outcomes for guarding actions first
-        print("   {:<10s} | {:<16s} | {:<16s} | {:<16s} |---> {}".format("Action", "Attacker", "Guardian", "Target", "Result"), file=file)
+        lines.append(_ENGAGEMENT_FMT("Action", "Attacker", "Guardian", "Target", "Result"))
         for egout in engagement_outcomes:
-            success_status = "Success" if egout[GS.SUCCESS] else "Failure"
-            if egout[GS.ACTION_TYPE] == U.SHOOT or egout[GS.ACTION_TYPE] == U.COLLIDE:
-                print("   {:<10s} | {:<16s} | {:<16s} | {:<16s} |---> {}".format(
-                    egout[GS.ACTION_TYPE], egout[GS.ATTACKER_ID], "", egout[GS.TARGET_ID], success_status), file=file)
-            elif egout[GS.ACTION_TYPE] == U.GUARD:
-                if isinstance(egout[GS.ATTACKER_ID], str):
-                    print("   {:<10s} | {:<16s} | {:<16s} | {:<16s} |---> {}".format(
-                        egout[GS.ACTION_TYPE], egout[GS.ATTACKER_ID], egout[GS.GUARDIAN_ID], egout[GS.TARGET_ID], success_status), file=file)
-                else:
-                    print("   {:<10s} | {:<16s} | {:<16s} | {:<16s} |---> {}".format(
-                        egout[GS.ACTION_TYPE], "", egout[GS.GUARDIAN_ID], egout[GS.TARGET_ID], success_status), file=file)
-            elif egout[GS.ACTION_TYPE] == U.NOOP:
-                print("NOOP", file=file)
-            else:
-                raise ValueError("Unrecognized action type {}".format(egout[GS.ACTION_TYPE]))
+            try:
+                fmt = _ENGAGEMENT_OUTCOME_FMTS[egout[GS.ACTION_TYPE]]
+            except KeyError:
+                raise ValueError("Unrecognized action type {}".format(egout[GS.ACTION_TYPE])) from None
+            lines.append(fmt(egout))
+    if buf is None:
+        print("\n".join(lines), file=file)
+    else:
+        buf.extend(lines)
 
 def print_endgame_statsus(cur_game_state):
     '''
@@ -84,18 +339,15 @@ def print_endgame_statsus(cur_game_state):
         winner = 'draw'
     print("\n====GAME FINISHED====\nWinner: {}\nScore: {}|{}\n=====================\n".format(winner, alpha_score, beta_score))
 
-    if cur_game_state[GS.TOKEN_STATES][0]['fuel'] <= DGP.MIN_FUEL:
-        term_cond = U.P1+" out of fuel"
-    elif cur_game_state[GS.TOKEN_STATES][1]['fuel'] <= DGP.MIN_FUEL:
-        term_cond = U.P2+" out of fuel"
-    elif cur_game_state[GS.SCORE_ALPHA] >= DGP.WIN_SCORE[U.P1]:
-        term_cond = U.P1+" reached Win Score"
-    elif cur_game_state[GS.SCORE_BETA]  >= DGP.WIN_SCORE[U.P2]:
-        term_cond = U.P2+" reached Win Score"
-    elif cur_game_state[GS.TURN_NUMBER]  >= DGP.MAX_TURNS:
-        term_cond = "max turns reached" 
-    else:
-        term_cond = "unknown"
+    # termination conditions in order of precedence, first one met is reported
+    term_conds = (
+        (cur_game_state[GS.TOKEN_STATES][0][GS.FUEL] <= DGP.MIN_FUEL, U.P1+" out of fuel"),
+        (cur_game_state[GS.TOKEN_STATES][1][GS.FUEL] <= DGP.MIN_FUEL, U.P2+" out of fuel"),
+        (alpha_score >= DGP.WIN_SCORE[U.P1], U.P1+" reached Win Score"),
+        (beta_score >= DGP.WIN_SCORE[U.P2], U.P2+" reached Win Score"),
+        (cur_game_state[GS.TURN_NUMBER] >= DGP.MAX_TURNS, "max turns reached"),
+    )
+    term_cond = next((label for met, label in term_conds if met), "unknown")
     print("Termination condition: {}".format(term_cond))
 
 
@@ -5,7 +5,7 @@
 # Communication bridge to Unity for rendering and human I/O using ZMQ
 
 import zmq
-import json
+import orjson
 import multiprocessing
 import uuid
 from collections import namedtuple, OrderedDict
@@ -23,6 +23,29 @@ from orbit_defender2d.king_of_the_hill.koth import KOTHGame, KOTHTokenState, Sat
 TCP_PORT = 'tcp_port'
 ROUTER_PORT = 'router_port'
 PUB_PORT = 'publisher_port'
+# optional explicit endpoints (e.g. ipc:///tmp/od2d_router.sock) bound in
+# addition to, or instead of, the tcp ports above. Useful for avoiding the
+# tcp loopback stack when clients are on the same host as the server
+SERVER_ADDR = 'server_addr'
+ROUTER_ADDR = 'router_addr'
+PUB_ADDR = 'publisher_addr'
+SOCKET_OPTIONS = 'socket_options'
+
+# socket options applied to every server socket, entries in 
+# comm_configs[SOCKET_OPTIONS] take precedence over these defaults.
+# Unlimited high-water marks keep PUB from silently dropping game state 
+# updates and zero linger lets a server process terminate immediately
+DEFAULT_SOCKET_OPTIONS = {
+    zmq.SNDHWM: 0,
+    zmq.RCVHWM: 0,
+    zmq.LINGER: 0,
+}
+
+# additional options for ROUTER sockets, unroutable replies raise
+# an error instead of being silently dropped
+DEFAULT_ROUTER_SOCKET_OPTIONS = {
+    zmq.ROUTER_MANDATORY: 1,
+}
 
 # ref: https://google.github.io/styleguide/jsoncstyleguide.xml
 # ref: https://github.com/mit-ll/spacegym-od2d/wiki/Dev-Notes#python-unity-json-api-v202105030000
@@ -73,6 +96,54 @@ PLAYER_UUID = 'playerUUID'
 CUR_1P_API_VERSION = "v2021.11.18.0000.1p"
 CUR_2P_API_VERSION = "v2022.07.26.0000.2p"
 
+def _json_default(obj):
+    ''' serialize objects not natively handled by orjson the same way the json module does 
+    (e.g. MovementTuple, EngagementTuple as json arrays)
+    '''
+    if isinstance(obj, tuple):
+        return list(obj)
+    raise TypeError("Type is not JSON serializable: {}".format(type(obj).__name__))
+
+def encode_message(msg: Dict) -> bytes:
+    ''' serialize API message dictionary to json bytes with orjson
+
+    Messages remain json for compatibility with non-python clients (e.g. Unity UI)
+    '''
+    return orjson.dumps(msg, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+def pub_topic(api_version: str, context: str) -> bytes:
+    ''' leading bytes of every message published by the server with given api version and context
+
+    Published messages are single-frame json (for compatibility with the Unity UI client)
+    that always begin with the api version and context fields, so SUB clients 
+    can subscribe to this prefix to have libzmq filter by context without parsing
+    '''
+    # drop closing brace so that remaining fields of published message can follow
+    return encode_message({API_VERSION: api_version, CONTEXT: context})[:-1]
+
+def _format_movement_actions(legal_actions):
+    return [{ACTION_TYPE:a.action_type} for a in legal_actions]
+
+def _format_engagement_actions(legal_actions):
+    return [{ACTION_TYPE:a.action_type, TARGET_ID:a.target} for a in legal_actions]
+
+def _format_drift_actions(legal_actions):
+    return []
+
+# formatter of a token's legal actions as API-compatible dicts for each turn phase
+_LEGAL_ACTION_FORMATTERS = {
+    U.MOVEMENT: _format_movement_actions,
+    U.ENGAGEMENT: _format_engagement_actions,
+    U.DRIFT: _format_drift_actions,
+}
+
+def get_legal_action_formatter(turn_phase):
+    ''' function formatting a token's legal actions as API-compatible dicts in given turn phase'''
+    try:
+        return _LEGAL_ACTION_FORMATTERS[turn_phase]
+    except KeyError:
+        raise ValueError("Unrecognized turn phase {}".format(turn_phase)) from None
+
 # RegisteredPlayer = namedtuple('RegisteredPlayer', ['player_id', 'client_uid'])
 ClientIDTuple = namedtuple('ClientIDTuple', ['alias', 'uid'])
 
@@ -120,10 +191,40 @@ class GameServer(multiprocessing.Process):
         super().__init__()
         self.comm_configs = comm_configs
         self.game = game
+        self._game_id = id(game)    # python identifier of game object sent as GAME_ID
 
     def run(self):
         raise NotImplementedError('Child class must implement run()')
 
+    def configure_socket(self, sock: zmq.Socket, defaults: Dict=None) -> None:
+        ''' apply default and user-specified socket options to socket
+
+        Args:
+            sock (zmq.Socket): socket to be configured, before bind
+            defaults (dict): additional socket-type-specific default options
+        '''
+        sock_opts = dict(DEFAULT_SOCKET_OPTIONS)
+        if defaults is not None:
+            sock_opts.update(defaults)
+        sock_opts.update(self.comm_configs.get(SOCKET_OPTIONS, {}))
+        for opt, val in sock_opts.items():
+            sock.setsockopt(opt, val)
+
+    def bind_socket(self, sock: zmq.Socket, port_key: str, addr_key: str) -> None:
+        ''' bind socket to tcp port and/or explicit endpoint specified in comm_configs
+
+        Args:
+            sock (zmq.Socket): socket to be bound
+            port_key (str): comm_configs key of tcp port number
+            addr_key (str): comm_configs key of endpoint address (e.g. ipc://, inproc://)
+        '''
+        if port_key not in self.comm_configs and addr_key not in self.comm_configs:
+            raise ValueError("comm_configs must specify at least one of {} or {}".format(port_key, addr_key))
+        if port_key in self.comm_configs:
+            sock.bind("tcp://*:{}".format(self.comm_configs[port_key]))
+        if addr_key in self.comm_configs:
+            sock.bind(self.comm_configs[addr_key])
+
     def echo_request(self, req_msg) -> Dict:
         ''' a simple function to test TCP connection with Unity client 
         
@@ -160,14 +261,16 @@ class GameServer(multiprocessing.Process):
             rep_msg (dict): API-compatible response message containing game state
         '''
 
-        rep_msg = dict()
-        rep_msg[API_VERSION] = api_version
-        rep_msg[CONTEXT] = req_msg[CONTEXT]
-        rep_msg[GAME_ID] = id(self.game)
-        rep_msg[DATA] = dict()
-        rep_msg[DATA][KIND] = data_kind
-        rep_msg[DATA][GAME_STATE] = game_state
-        rep_msg[DATA][ACTION_SELECTIONS] = actions
+        # built as dict displays, key order is kept for the api version and context
+        # prefix that SUB clients filter on (see pub_topic)
+        rep_msg = {
+            API_VERSION: api_version,
+            CONTEXT: req_msg[CONTEXT],
+            GAME_ID: self._game_id,
+            DATA: {
+                KIND: data_kind,
+                GAME_STATE: game_state,
+                ACTION_SELECTIONS: actions}}
         if data_kind == ENGAGE_PHASE_RESP:
             rep_msg[DATA][RESOLUTION_SEQUENCE] = engagement_outcomes
         if is_2player:
@@ -183,41 +286,31 @@ class GameServer(multiprocessing.Process):
         ''' encode game state and engagement outcomes as API-compatible dictionaries
         '''
 
-        game_state = dict()
-        game_state[TURN_NUMBER] = self.game.game_state[U.TURN_COUNT]
-        game_state[TURN_PHASE] = self.game.game_state[U.TURN_PHASE]
-        game_state[GAME_DONE] = self.game.game_state[U.GAME_DONE]
-        game_state[GOAL_ALPHA] = self.game.game_state[U.GOAL1]
-        game_state[GOAL_BETA] = self.game.game_state[U.GOAL2]
-        game_state[SCORE_ALPHA] = self.game.game_state[U.P1][U.SCORE]
-        game_state[SCORE_BETA] = self.game.game_state[U.P2][U.SCORE]
-        game_state[TOKEN_STATES] = [{
-            PIECE_ID:token_name,
-            FUEL:token_state.satellite.fuel,
-            ROLE:token_state.role,
-            POSITION:token_state.position,
-            AMMO:token_state.satellite.ammo,
-            LEGAL_ACTIONS:self.get_token_legal_actions(token_name=token_name)
-            } for token_name, token_state in self.game.token_catalog.items()]
-
-        return game_state
+        gs = self.game.game_state
+        # turn phase is the same for all tokens, pick the legal action formatter once
+        fmt_legal_actions = get_legal_action_formatter(gs[U.TURN_PHASE])
+        legal_actions = gs[U.LEGAL_ACTIONS]
+        return {
+            TURN_NUMBER: gs[U.TURN_COUNT],
+            TURN_PHASE: gs[U.TURN_PHASE],
+            GAME_DONE: gs[U.GAME_DONE],
+            GOAL_ALPHA: gs[U.GOAL1],
+            GOAL_BETA: gs[U.GOAL2],
+            SCORE_ALPHA: gs[U.P1][U.SCORE],
+            SCORE_BETA: gs[U.P2][U.SCORE],
+            TOKEN_STATES: [{
+                PIECE_ID:token_name,
+                FUEL:token_state.satellite.fuel,
+                ROLE:token_state.role,
+                POSITION:token_state.position,
+                AMMO:token_state.satellite.ammo,
+                LEGAL_ACTIONS:fmt_legal_actions(legal_actions[token_name])
+                } for token_name, token_state in self.game.token_catalog.items()]}
 
     def get_token_legal_actions(self, token_name):
         ''' get list of dictionaries of legal actions from game state'''
-        legal_actions = None
-        if self.game.game_state[U.TURN_PHASE] == U.MOVEMENT:
-            legal_actions = [{
-                ACTION_TYPE:i.action_type} for i in self.game.game_state[U.LEGAL_ACTIONS][token_name]]
-        elif self.game.game_state[U.TURN_PHASE] == U.ENGAGEMENT:
-            legal_actions = [{
-                ACTION_TYPE:i.action_type, 
-                TARGET_ID:i.target} for i in self.game.game_state[U.LEGAL_ACTIONS][token_name]]
-        elif self.game.game_state[U.TURN_PHASE] == U.DRIFT:
-            legal_actions = []
-        else:
-            raise ValueError("Unrecognized turn phase {}".format(self.game.game_state[U.TURN_PHASE]))
-
-        return legal_actions
+        fmt_legal_actions = get_legal_action_formatter(self.game.game_state[U.TURN_PHASE])
+        return fmt_legal_actions(self.game.game_state[U.LEGAL_ACTIONS][token_name])
 
 class TwoPlayerGameServer(GameServer):
     ''' game server that assumes two users on separate clients
@@ -229,6 +322,15 @@ class TwoPlayerGameServer(GameServer):
         self.player_registry = bidict()
         self.reset_player_input_queue() 
 
+        # request handlers by message context, echo is handled before api version check
+        self._context_handlers = {
+            PLAYER_REGISTRATION: self.process_registration_request,
+            GAME_RESET: self.process_player_action_request,
+            MOVE_PHASE: self.process_player_action_request,
+            ENGAGE_PHASE: self.process_player_action_request,
+            DRIFT_PHASE: self.process_player_action_request,
+        }
+
     def run(self):
         ''' Setup and run ROUTER and PUB sockets to handle I/O from player clients
         Refs: 
@@ -241,14 +343,16 @@ class TwoPlayerGameServer(GameServer):
 
         # prepare publisher socket to send state information
         self.publisher_socket = ctx.socket(zmq.PUB)
-        self.publisher_socket.bind("tcp://*:{}".format(self.comm_configs[PUB_PORT]))
+        self.configure_socket(self.publisher_socket)
+        self.bind_socket(self.publisher_socket, PUB_PORT, PUB_ADDR)
 
         # create I/O loop to accept requests to router
         router_loop = ioloop.IOLoop.instance()
 
         # create ROUTER socket and stream for handling actions requests from player clients
         router_socket = ctx.socket(zmq.ROUTER)
-        router_socket.bind("tcp://*:{}".format(self.comm_configs[ROUTER_PORT]))
+        self.configure_socket(router_socket, defaults=DEFAULT_ROUTER_SOCKET_OPTIONS)
+        self.bind_socket(router_socket, ROUTER_PORT, ROUTER_ADDR)
         self.router_stream = zmqstream.ZMQStream(router_socket, router_loop)
         self.router_stream.on_recv(self.router_io)
 
@@ -278,21 +382,24 @@ class TwoPlayerGameServer(GameServer):
         # extract connection id and request message from respective frames
         # Ref: https://zguide.zeromq.org/docs/chapter3/#The-Extended-Reply-Envelope
         connection_id = raw_msg[0]
-        req_msg = json.loads(raw_msg[2])
+        req_msg = orjson.loads(raw_msg[2])
 
         # get response message
         resp_msg = self.process_request(req_msg=req_msg)
 
         # send response message 
         # Need to use multipart message with appropriate frames to respond to a REQ socket
-        # json must be converted to string then bytes
+        # response is serialized directly to json bytes, see encode_message
         # Ref: https://zguide.zeromq.org/docs/chapter3/#The-Extended-Reply-Envelope
         # Ref: https://zguide.zeromq.org/docs/chapter3/#ROUTER-Broker-and-REQ-Workers
         self.router_stream.send_multipart([
             connection_id,
             b'',
-            json.dumps(resp_msg).encode('utf-8')
+            encode_message(resp_msg)
         ])
+        # ZMQStream queues sends until the next loop iteration, flush so the reply 
+        # goes out right behind any game state just sent on the PUB socket
+        self.router_stream.flush(zmq.POLLOUT)
     
     def process_request(self, req_msg:Dict) -> None:
         ''' send request to appropriate callback and return response message
@@ -319,58 +426,78 @@ class TwoPlayerGameServer(GameServer):
             return err_msg
 
         # if no api version error, handle message based on context
-        if req_msg[CONTEXT] == PLAYER_REGISTRATION:
+        handler = self._context_handlers.get(req_msg[CONTEXT])
+        if handler is None:
+            return self.handle_invalid_request(req_msg=req_msg,
+                    err_str="Unrecognized message context {}".format(req_msg[CONTEXT]))
 
-            # generate unique client id
-            client_uid = str(uuid.uuid4())
+        return handler(req_msg)
 
-            # register new player if slot is available, return error if not
-            resp_msg, start_game = self.register_new_player(client_uid, req_msg)
+    def process_registration_request(self, req_msg:Dict) -> Dict:
+        ''' register new player and start game once both players are registered
 
-            # start game if both players registered (condition decided by register func)
-            if start_game:
-                # reset game, access and format game state data
-                self.game.reset_game()
-                game_state = self.get_game_state()
-                engagement_outcomes = None
+        Args:
+            req_msg: dict
+                player registration request message
+        
+        Returns:
+            resp_msg: dict
+                player registration response or error
+        '''
 
-                # publish new game state on PUB socket
-                pub_msg = self.format_game_state_response_message(
-                    req_msg = req_msg,
-                    api_version=CUR_2P_API_VERSION,
-                    data_kind=GAME_RESET_RESP,
-                    game_state=game_state, 
-                    engagement_outcomes=engagement_outcomes,
-                    is_2player=True)
-                self.publisher_socket.send_json(pub_msg)
+        # generate unique client id
+        client_uid = str(uuid.uuid4())
 
-            return resp_msg
+        # register new player if slot is available, return error if not
+        resp_msg, start_game = self.register_new_player(client_uid, req_msg)
 
-        elif req_msg[CONTEXT] in [GAME_RESET, MOVE_PHASE, ENGAGE_PHASE, DRIFT_PHASE]:
+        # start game if both players registered (condition decided by register func)
+        if start_game:
+            # reset game, access and format game state data
+            self.game.reset_game()
+            game_state = self.get_game_state()
+            engagement_outcomes = None
 
-            # verify request player alias matches existing registered player
-            cli_id = ClientIDTuple(alias=req_msg[PLAYER_ALIAS], uid=req_msg[PLAYER_UUID])
-            if cli_id not in self.player_registry.inv.keys():
+            # publish new game state on PUB socket
+            pub_msg = self.format_game_state_response_message(
+                req_msg = req_msg,
+                api_version=CUR_2P_API_VERSION,
+                data_kind=GAME_RESET_RESP,
+                game_state=game_state, 
+                engagement_outcomes=engagement_outcomes,
+                is_2player=True)
+            self.publisher_socket.send(encode_message(pub_msg))
 
-                # no player registered with this alias-UID combination, return error
-                return self.handle_invalid_request(req_msg=req_msg,
-                    err_str="No player registered with alias {} and REQ client ID {}".format(
-                        cli_id.alias,
-                        cli_id.uid
-                    )
-                )
-            
-            # map client id information to backend player identifier (e.g. U.P1 OR U.P2)
-            player_id = self.player_registry.inv[cli_id]
+        return resp_msg
 
-            # apply player's request to take action in game object 
-            return self.process_game_action_request(req_msg=req_msg, player_id=player_id)
+    def process_player_action_request(self, req_msg:Dict) -> Dict:
+        ''' verify request comes from a registered player and apply it to the game
 
-        else:
+        Args:
+            req_msg: dict
+                game reset or action request message
+        
+        Returns:
+            resp_msg: dict
+                advancing, waiting or error response
+        '''
+
+        # verify request player alias matches existing registered player
+        # and map client id information to backend player identifier (e.g. U.P1 OR U.P2)
+        cli_id = ClientIDTuple(alias=req_msg[PLAYER_ALIAS], uid=req_msg[PLAYER_UUID])
+        player_id = self.player_registry.inv.get(cli_id)
+        if player_id is None:
+
+            # no player registered with this alias-UID combination, return error
             return self.handle_invalid_request(req_msg=req_msg,
-                    err_str="Unrecognized message context {}".format(req_msg[CONTEXT]))
+                err_str="No player registered with alias {} and REQ client ID {}".format(
+                    cli_id.alias,
+                    cli_id.uid
+                )
+            )
 
-        raise NotImplementedError('Expected to reach a return statement before this')
+        # apply player's request to take action in game object 
+        return self.process_game_action_request(req_msg=req_msg, player_id=player_id)
 
 
     def register_new_player(self, client_uid: str, req_msg:Dict) -> Dict:
@@ -405,22 +532,21 @@ class TwoPlayerGameServer(GameServer):
             uid=client_uid)
 
         # check for player alias collisions
-        for cid in self.player_registry.inv.keys():
+        for plr_id, cid in self.player_registry.items():
             if cid.alias == cli_id.alias:
                 return self.handle_invalid_request(
                     req_msg=req_msg,
                     err_str='Client with alias {} already registered to player {}'.format(
-                        cli_id.alias, self.player_registry.inv[cid]
+                        cli_id.alias, plr_id
                     )
                 ), False
 
         # begin formatting response
-        resp_msg = dict()
-        resp_msg[API_VERSION] = CUR_2P_API_VERSION
-        resp_msg[CONTEXT] = req_msg[CONTEXT]
-        resp_msg[GAME_ID] = id(self.game)   # python identifier of game object
-        resp_msg[DATA] = dict()
-        resp_msg[DATA][KIND] = PLAYER_REGISTRATION_RESP
+        resp_msg = {
+            API_VERSION: CUR_2P_API_VERSION,
+            CONTEXT: req_msg[CONTEXT],
+            GAME_ID: self._game_id,
+            DATA: {KIND: PLAYER_REGISTRATION_RESP}}
         
         # register new players to empty slots in order of arrival
         start_game = False
@@ -533,7 +659,7 @@ class TwoPlayerGameServer(GameServer):
                 engagement_outcomes=engagement_outcomes,
                 is_2player=True,
                 actions=player_actions)
-            self.publisher_socket.send_json(resp_msg)
+            self.publisher_socket.send(encode_message(resp_msg))
 
             # reset player inputs
             self.reset_player_input_queue()
@@ -630,21 +756,16 @@ class TwoPlayerGameServer(GameServer):
                 dictionary formatting the response message
 
         '''
-        resp_msg = dict()
-        resp_msg[API_VERSION] = CUR_2P_API_VERSION
-        resp_msg[CONTEXT] = req_msg[CONTEXT]
-        resp_msg[GAME_ID] = id(self.game)
-        resp_msg[DATA] = dict()
-        resp_msg[DATA] = resp_data
-
-        return resp_msg
+        return {
+            API_VERSION: CUR_2P_API_VERSION,
+            CONTEXT: req_msg[CONTEXT],
+            GAME_ID: self._game_id,
+            DATA: resp_data}
 
     def player_input_queue_filled(self) -> bool:
         '''check for inputs from both players'''
-        return all([
-            (p in self.player_input_queue.keys() and self.player_input_queue[p] is not None)
-            for p in [U.P1, U.P2]
-        ])
+        queue = self.player_input_queue
+        return queue.get(U.P1) is not None and queue.get(U.P2) is not None
 
 
     def handle_invalid_request(self, req_msg:Dict, err_str:str) -> Dict:
@@ -661,14 +782,11 @@ class TwoPlayerGameServer(GameServer):
                 dictionary formatting the response message
         '''
 
-        resp_msg = dict()
-        resp_msg[API_VERSION] = CUR_2P_API_VERSION
-        resp_msg[CONTEXT] = req_msg[CONTEXT]
-        resp_msg[GAME_ID] = id(self.game)
-        resp_msg[ERROR] = dict()
-        resp_msg[ERROR][MESSAGE] = "Invalid Request: {}".format(err_str)
-
-        return resp_msg
+        return {
+            API_VERSION: CUR_2P_API_VERSION,
+            CONTEXT: req_msg[CONTEXT],
+            GAME_ID: self._game_id,
+            ERROR: {MESSAGE: "Invalid Request: {}".format(err_str)}}
 
     def check_game_context(self, req_msg:Dict):
         ''' verify message context and kind align with game state
@@ -680,56 +798,41 @@ class TwoPlayerGameServer(GameServer):
             err_msg: None OR dict
                 dictionary formatting the response message
         '''
-        is_err = False
         err_msg = None
-        err_str = ""
+        err_parts = []
 
         def err_data_kind_formatter(expected_kind):
-            return "In context {}, expected data of kind {}. Got {}\n".format(
-                req_msg[CONTEXT],
-                expected_kind,
-                req_msg[DATA][KIND])
+            return f"In context {req_msg[CONTEXT]}, expected data of kind {expected_kind}. Got {req_msg[DATA][KIND]}\n"
 
         def err_game_state_formatter(expected_game_state):
-            return "In context {}, expected a game state of {}. Got {}\n".format(
-                req_msg[CONTEXT],
-                expected_game_state,
-                self.game.game_state[U.TURN_PHASE])
+            return f"In context {req_msg[CONTEXT]}, expected a game state of {expected_game_state}. Got {self.game.game_state[U.TURN_PHASE]}\n"
 
         if req_msg[CONTEXT] in [GAME_RESET]:
             pass
         elif req_msg[CONTEXT] == MOVE_PHASE:
             tok_check = self.check_player_request_tokens(req_msg=req_msg)
             if tok_check:
-                is_err = True
-                err_str += tok_check
+                err_parts.append(tok_check)
             if self.game.game_state[U.TURN_PHASE] != U.MOVEMENT:
-                is_err = True
-                err_str += err_game_state_formatter(U.MOVEMENT)
+                err_parts.append(err_game_state_formatter(U.MOVEMENT))
             if req_msg[DATA][KIND] != MOVE_PHASE_REQ:
-                is_err = True
-                err_str += err_data_kind_formatter(MOVE_PHASE_REQ)
+                err_parts.append(err_data_kind_formatter(MOVE_PHASE_REQ))
         elif req_msg[CONTEXT] == ENGAGE_PHASE:
             tok_check = self.check_player_request_tokens(req_msg=req_msg)
             if tok_check:
-                is_err = True
-                err_str += tok_check
+                err_parts.append(tok_check)
             if self.game.game_state[U.TURN_PHASE] != U.ENGAGEMENT:
-                is_err = True
-                err_str += err_game_state_formatter(U.ENGAGEMENT)
+                err_parts.append(err_game_state_formatter(U.ENGAGEMENT))
             if req_msg[DATA][KIND] != ENGAGE_PHASE_REQ:
-                is_err = True
-                err_str += err_data_kind_formatter(ENGAGE_PHASE_REQ)
+                err_parts.append(err_data_kind_formatter(ENGAGE_PHASE_REQ))
         elif req_msg[CONTEXT] == DRIFT_PHASE:
             if self.game.game_state[U.TURN_PHASE] != U.DRIFT:
-                is_err = True
-                err_str += err_game_state_formatter(U.DRIFT)
+                err_parts.append(err_game_state_formatter(U.DRIFT))
         else:
-            is_err = True
-            err_str += "Unexpected message context {}".format(req_msg[CONTEXT])
+            err_parts.append(f"Unexpected message context {req_msg[CONTEXT]}")
 
-        if is_err:
-            err_msg = self.handle_invalid_request(req_msg=req_msg, err_str=err_str)
+        if err_parts:
+            err_msg = self.handle_invalid_request(req_msg=req_msg, err_str="".join(err_parts))
 
         return err_msg
 
@@ -784,7 +887,8 @@ class SingleUserGameServer(GameServer):
         loop = ioloop.IOLoop.instance()
 
         server_socket = context.socket(zmq.REP)
-        server_socket.bind("tcp://*:{}".format(self.comm_configs[TCP_PORT]))
+        self.configure_socket(server_socket)
+        self.bind_socket(server_socket, TCP_PORT, SERVER_ADDR)
         self.server_stream = zmqstream.ZMQStream(server_socket, loop)
         self.server_stream.on_recv(self.handle_request)
 
@@ -801,7 +905,7 @@ class SingleUserGameServer(GameServer):
         '''
 
         # decode json message into dictionary
-        req_msg = json.loads(raw_msg[0])
+        req_msg = orjson.loads(raw_msg[0])
 
         # handle message response based on message kind
         if req_msg[CONTEXT] == ECHO:
@@ -827,7 +931,7 @@ class SingleUserGameServer(GameServer):
             raise ValueError("Unrecognized message context {}".format(req_msg[CONTEXT]))
 
         # send response message
-        self.server_stream.send_json(rep_msg)
+        self.server_stream.send(encode_message(rep_msg))
 
 
     def handle_game_reset_request(self, init_req_msg: Dict) -> Dict:
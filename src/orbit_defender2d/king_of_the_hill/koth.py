@@ -40,6 +40,8 @@ KOTHGameInputArgs = namedtuple('KOTHGameInputArgs',[
 
 class KOTHTokenState:
     ''' object encodes state of a single piece on the board (e.g. satellite, sector, etc.)'''
+    __slots__ = ('satellite', 'role', 'position')
+
     def __init__(self, satellite, role, position):
         self.satellite = satellite
         self.role = role
@@ -147,8 +149,39 @@ class KOTHGame:
         self.player_names = [U.P1, U.P2]
         self.n_players = len(self.player_names)
         self.engagement_outcomes = None
+
         self.reset_game()
 
+    @classmethod
+    def from_args(cls, args: KOTHGameInputArgs):
+        ''' create game directly from KOTHGameInputArgs, without building a keyword dict via _asdict()
+
+        Args:
+            args (KOTHGameInputArgs): game parameters
+        
+        Returns:
+            game (KOTHGame): new game object
+        '''
+        return cls(
+            max_ring=args.max_ring,
+            min_ring=args.min_ring,
+            geo_ring=args.geo_ring,
+            init_board_pattern_p1=args.init_board_pattern_p1,
+            init_board_pattern_p2=args.init_board_pattern_p2,
+            init_fuel=args.init_fuel,
+            init_ammo=args.init_ammo,
+            min_fuel=args.min_fuel,
+            fuel_usage=args.fuel_usage,
+            engage_probs=args.engage_probs,
+            illegal_action_score=args.illegal_action_score,
+            in_goal_points=args.in_goal_points,
+            adj_goal_points=args.adj_goal_points,
+            fuel_points_factor=args.fuel_points_factor,
+            win_score=args.win_score,
+            max_turns=args.max_turns,
+            fuel_points_factor_bludger=args.fuel_points_factor_bludger,
+        )
+
     def reset_game(self):
         ''' reset game state without reinstantiating a new game object
         '''
@@ -1119,6 +1152,50 @@ class KOTHGame:
             actions_dict = self.get_input_actions(plr_id=plr_id)
         return actions_dict
 
+class RandomValidActionSampler:
+    ''' draws random-yet-valid actions for a game, equivalent to KOTHGame.get_random_valid_actions
+
+    The per-token legal actions (and their counts) are cached and only rebuilt when the
+    game replaces its legal actions (i.e. on turn phase change or reset), and all
+    token action indices are drawn in a single call to the random number generator
+    '''
+    def __init__(self, game):
+        self.game = game
+        self._legal = None
+        self._tokens = None
+        self._options = None
+        self._n_options = None
+
+    def _refresh(self, legal):
+        self._legal = legal
+        self._tokens = list(legal.keys())
+        self._options = [legal[t] for t in self._tokens]
+        self._n_options = np.array([len(a) for a in self._options])
+
+    def sample(self) -> Dict:
+        '''random valid action for each token, see KOTHGame.get_random_valid_actions'''
+        game = self.game
+        turn_phase = game.game_state[U.TURN_PHASE]
+        if turn_phase == U.DRIFT:
+            return None
+
+        legal = game.game_state[U.LEGAL_ACTIONS]
+        if legal is not self._legal:
+            self._refresh(legal)
+
+        idxs = np.random.randint(0, self._n_options).tolist()
+        actions = {t:a[i] for t, a, i in zip(self._tokens, self._options, idxs)}
+
+        # apply appropriate probabilities for engagements
+        if turn_phase == U.ENGAGEMENT:
+            get_prob = game.get_engagement_probability
+            actions = {t:U.EngagementTuple(
+                action_type=a.action_type, 
+                target=a.target, 
+                prob=get_prob(t, a.target, a.action_type)) for t, a in actions.items()}
+
+        return actions
+
 def parse_token_id(t):
     ''' get player_id, role, and token_num from token_id
     
@@ -1345,10 +1422,10 @@ def print_game_info(game, file=None):
     # print("alpha player state: ")
     # for tok in game.game_state[U.P1][U.TOKEN_STATES]:
     #     print("-->{} | fuel: {} | position: {}".format(tok.satellite.fuel, tok.position))
-    print("STATES:", file=file)
-    for toknm, tok in game.token_catalog.items():
-        if tok.satellite.fuel >= 0 and tok.position > 0:
-            print("   {:<16s}| position: {:<4d}| fuel: {:<8.1f} ".format(toknm, tok.position, tok.satellite.fuel), file=file)
+    lines = ["STATES:"]
+    lines.extend(f"   {toknm:<16s}| position: {tok.position:<4d}| fuel: {tok.satellite.fuel:<8.1f} " 
+        for toknm, tok in game.token_catalog.items() if tok.satellite.fuel >= 0 and tok.position > 0)
+    print("\n".join(lines), file=file)
     #print("alpha|beta score: {}|{}".format(game.game_state[U.P1][U.SCORE],game.game_state[U.P2][U.SCORE]))
 
 def print_scores(game, file=None):
@@ -1358,12 +1435,12 @@ def print_scores(game, file=None):
     print(U.P2+" score: {}".format(game.game_state[U.P2][U.SCORE]), file=file)
 
 def print_actions(actions, file=None):
-    print("ACTIONS:", file=file)
+    lines = ["ACTIONS:"]
     if actions is None:
-        print("   None", file=file)
+        lines.append("   None")
     else:
-        for toknm, act in actions.items():
-            print("   {:<15s} | {}".format(toknm, act), file=file)
+        lines.extend(f"   {toknm:<15s} | {act}" for toknm, act in actions.items())
+    print("\n".join(lines), file=file)
 
 def print_engagement_outcomes(engagement_outcomes, file=None):
     print("ENGAGEMENT OUTCOMES:", file=file)    
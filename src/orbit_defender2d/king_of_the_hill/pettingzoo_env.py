@@ -12,7 +12,7 @@
 
 from tabnanny import verbose
 import numpy as np
-import json
+import orjson
 import pygame as pg
 from collections import namedtuple, OrderedDict
 
@@ -34,6 +34,14 @@ from orbit_defender2d.king_of_the_hill import koth
 from orbit_defender2d.king_of_the_hill.koth import KOTHTokenState
 from orbit_defender2d.utils.satellite import Satellite
 
+# relative and absolute tolerances for reward checks with math.isclose,
+# same values as the numpy.isclose defaults
+REWARD_RTOL = 1e-5
+REWARD_ATOL = 1e-8
+
+# window events after which the last rendered frame must be repainted
+_REPAINT_EVENTS = frozenset((pg.VIDEOEXPOSE, pg.WINDOWEXPOSED, pg.WINDOWSHOWN, pg.WINDOWRESTORED))
+
 def init_with_defaults():
     '''
     Initialize game with default parameters by importing DGP
@@ -300,14 +308,18 @@ class parallel_env(ParallelEnv):
         https://github.com/PettingZoo-Team/PettingZoo/blob/master/pettingzoo/classic/chess/chess_env.py
         '''
 
+        # incremented whenever the game or displayed actions may have changed,
+        # part of the signature used to skip redrawing an unchanged frame in human mode
+        self._render_version = 0
+
         # instantiate game object
         if game_params is None:
             #Initialize game with default parameters
             init_with_defaults()
-            self.kothgame = koth.KOTHGame(**GAME_PARAMS._asdict())
+            self.kothgame = koth.KOTHGame.from_args(GAME_PARAMS)
         else:
             init_with_params(game_params)
-            self.kothgame = koth.KOTHGame(**game_params._asdict())
+            self.kothgame = koth.KOTHGame.from_args(game_params)
 
         # get agent names from game object
         self.possible_agents = self.kothgame.player_names
@@ -413,6 +425,10 @@ class parallel_env(ParallelEnv):
         self.actions = None
         self._eg_outcomes_phase = False
 
+        # scalar signature of everything drawn by render, used to skip redrawing an 
+        # unchanged frame in human mode
+        self._render_sig = None
+
         # program flow and user control
         self._is_paused = True
         self._latency = 500  # milliseconds between displaying turn phases
@@ -451,6 +467,26 @@ class parallel_env(ParallelEnv):
         pg.display.set_caption('Orbit Defender')
         self.initialize_fonts()
 
+    @property
+    def kothgame(self):
+        return self._kothgame
+
+    @kothgame.setter
+    def kothgame(self, game):
+        # game may be replaced from outside (e.g. with a game state received from a server)
+        self._kothgame = game
+        self._render_version += 1
+
+    @property
+    def actions(self):
+        '''actions (or engagement outcomes) displayed by render'''
+        return self._actions
+
+    @actions.setter
+    def actions(self, actions):
+        self._actions = actions
+        self._render_version += 1
+
     def render(self, mode="human"):
         '''
         Renders the environment. In human mode, it opens
@@ -466,12 +502,11 @@ class parallel_env(ParallelEnv):
                 else:
                     filename = f'./render_single_output.json'
                 
-                self.render_json = open(filename, 'w')
+                self.render_json = open(filename, 'wb')
 
                 #Get game state & format it for sending
                 gs_formatted = UJD.format_response_message(GS.GAME_RESET_RESP, GS.GAME_RESET, self.kothgame)
-                json.dump(gs_formatted, self.render_json)
-                self.render_json.write('\n')
+                self.render_json.write(orjson.dumps(gs_formatted, option=orjson.OPT_SERIALIZE_NUMPY|orjson.OPT_APPEND_NEWLINE))
                 print(f"Wrote {GS.GAME_RESET_RESP} message")	
 
 
@@ -480,12 +515,17 @@ class parallel_env(ParallelEnv):
             self.enable_render(mode)
 
         if mode == "human" or mode == "debug":
-            self._screen.fill(self._bg_color)
-            self._draw_board()
-            self._draw_earth()
-            self._draw_details()
-            self._draw_tokens()
-            pg.display.update()
+            game_state = self.kothgame.game_state
+            render_sig = (self._render_version, game_state[U.TURN_COUNT], game_state[U.TURN_PHASE], 
+                game_state[U.GAME_DONE], self._eg_outcomes_phase, self._x_dim, self._y_dim)
+            if mode == "debug" or render_sig != self._render_sig:
+                self._render_sig = render_sig
+                self._screen.fill(self._bg_color)
+                self._draw_board()
+                self._draw_earth()
+                self._draw_details()
+                self._draw_tokens()
+                pg.display.update()
 
         if mode == "human":
             #pass
@@ -1260,7 +1300,10 @@ class parallel_env(ParallelEnv):
         timer = 0
         while timer < 1000:
             for event in pg.event.get():
-                if event.type == pg.VIDEORESIZE:
+                if event.type in _REPAINT_EVENTS:
+                    # window contents were lost or hidden, repaint last drawn frame
+                    pg.display.update()
+                elif event.type == pg.VIDEORESIZE:
                     h_ratio = event.h / self._y_dim_orig
                     w_ratio = event.w / self._x_dim_orig
                     if h_ratio > w_ratio:
@@ -1605,6 +1648,7 @@ class parallel_env(ParallelEnv):
         '''
         self.agents = self.possible_agents[:]
         self.kothgame.reset_game()
+        self._render_version += 1
         observations = self.encode_all_observaitons()
         self.legal_actions = {agent: observations[agent]['action_mask'] for agent in observations.keys()}
         self.gameover = False
@@ -1633,8 +1677,25 @@ class parallel_env(ParallelEnv):
             return {}, {}, {}, {}
 
         # convert gym-encoded actions to verbose actions and pass to koth game
-        self.verbose_actions = self.decode_all_discrete_actions(actions=actions)
         verbose_actions = self.decode_all_discrete_actions(actions=actions)
+        return self.step_native(verbose_actions)
+
+    def step_native(self, verbose_actions):
+        '''
+        same as step() but takes verbose koth actions directly, e.g. from 
+        kothgame.get_random_valid_actions(), skipping the round trip through 
+        encode_all_discrete_actions and decode_all_discrete_actions
+
+        Args:
+            verbose_actions : dict
+                key is token id, value is the token's MovementTuple or EngagementTuple
+        
+        Returns:
+            observations, rewards, dones, infos (see step())
+        '''
+        self.verbose_actions = verbose_actions
+        # game state is updated in place below
+        self._render_version += 1
 
         # Update state of game
         if self.kothgame.game_state[U.TURN_PHASE] == U.MOVEMENT:
@@ -1644,8 +1705,7 @@ class parallel_env(ParallelEnv):
             if self.render_json is not None:
                 # gs_dict = U.get_game_state(self.kothgame.game_state, self.kothgame.token_catalog)
                 gs_formatted = UJD.format_response_message(GS.MOVE_PHASE_RESP, GS.MOVE_PHASE, self.kothgame)
-                json.dump(gs_formatted, self.render_json)
-                self.render_json.write('\n')
+                self.render_json.write(orjson.dumps(gs_formatted, option=orjson.OPT_SERIALIZE_NUMPY|orjson.OPT_APPEND_NEWLINE))
                 print(f"Wrote {GS.MOVE_PHASE_RESP} message")   
 
         elif self.kothgame.game_state[U.TURN_PHASE] == U.ENGAGEMENT:
@@ -1653,8 +1713,7 @@ class parallel_env(ParallelEnv):
             if self.render_json is not None:
                 # gs_dict = U.get_game_state(self.kothgame.game_state, self.kothgame.token_catalog)
                 acts_formatted = UJD.format_action_message(GS.ENGAGE_PHASE_REQ, GS.ENGAGE_PHASE, self.kothgame, verbose_actions)
-                json.dump(acts_formatted, self.render_json)
-                self.render_json.write('\n')
+                self.render_json.write(orjson.dumps(acts_formatted, option=orjson.OPT_SERIALIZE_NUMPY|orjson.OPT_APPEND_NEWLINE))
                 print(f"Wrote {GS.ENGAGE_PHASE_REQ} message")
 
             # apply engagement actions to progress to engagment
@@ -1664,8 +1723,7 @@ class parallel_env(ParallelEnv):
             if self.render_json is not None:
                 # gs_dict = U.get_game_state(self.kothgame.game_state, self.kothgame.token_catalog)
                 gs_formatted = UJD.format_response_message(GS.ENGAGE_PHASE_RESP, GS.ENGAGE_PHASE, self.kothgame)
-                json.dump(gs_formatted, self.render_json)
-                self.render_json.write('\n')
+                self.render_json.write(orjson.dumps(gs_formatted, option=orjson.OPT_SERIALIZE_NUMPY|orjson.OPT_APPEND_NEWLINE))
                 print(f"Wrote {GS.ENGAGE_PHASE_RESP} message")
 
             assert self.kothgame.game_state[U.TURN_PHASE] == U.DRIFT
@@ -1676,8 +1734,7 @@ class parallel_env(ParallelEnv):
             if self.render_json is not None:
                 # gs_dict = U.get_game_state(self.kothgame.game_state, self.kothgame.token_catalog)
                 gs_formatted = UJD.format_response_message(GS.DRIFT_PHASE_RESP, GS.DRIFT_PHASE, self.kothgame)
-                json.dump(gs_formatted, self.render_json)
-                self.render_json.write('\n')
+                self.render_json.write(orjson.dumps(gs_formatted, option=orjson.OPT_SERIALIZE_NUMPY|orjson.OPT_APPEND_NEWLINE))
                 print(f"Wrote {GS.DRIFT_PHASE_RESP} message")
             
             # combine rewards:
@@ -1834,6 +1891,7 @@ class parallel_env(ParallelEnv):
         self.kothgame.token_catalog = local_token_catalog
         self.kothgame.n_tokens_alpha = len(p1_state)
         self.kothgame.n_tokens_beta = len(p2_state)
+        self._render_version += 1
 
         return game_state, local_token_catalog, len(p1_state), len(p2_state)
 
@@ -12,6 +12,9 @@ from typing import Dict, List, Tuple
 
 CUR_API_VERSION = "v2022.02.02.0000.display"
 
+# top-level message template, copied and filled in for each message
+_BASE_MSG = {GS.API_VERSION: CUR_API_VERSION, GS.CONTEXT: None, GS.GAME_ID: None, GS.DATA: None}
+
 
 
 def format_action_message(
@@ -31,27 +34,20 @@ def format_action_message(
             rep_msg (dict): API-compatible response message containing game state
         '''
 
-        act_msg = dict()
-        act_msg[GS.API_VERSION] = CUR_API_VERSION
+        act_msg = _BASE_MSG.copy()
         act_msg[GS.CONTEXT] = context
-        act_msg['gameID'] = id(game)
-        act_msg[GS.DATA] = dict()
-        act_msg[GS.DATA][GS.KIND] = data_kind
+        act_msg[GS.GAME_ID] = id(game)
+        act_data = act_msg[GS.DATA] = {GS.KIND: data_kind}
+        pid, act, tgt = GS.PIECE_ID, GS.ACTION_TYPE, GS.TARGET_ID
         if data_kind == GS.ENGAGE_PHASE_REQ:
-            
-            engagement_selections = [{
-                GS.PIECE_ID:i[0], 
-                GS.ACTION_TYPE:i[1][0],
-                GS.TARGET_ID: i[1][1]} for i in actions.items()]
-
-            act_msg[GS.DATA][GS.ENGAGEMENT_SELECTIONS] = engagement_selections
+            act_data[GS.ENGAGEMENT_SELECTIONS] = [{
+                pid:tok, 
+                act:a[0],
+                tgt:a[1]} for tok, a in actions.items()]
         elif data_kind == GS.MOVE_PHASE_REQ:
-            
-            movement_selections = [{
-                GS.PIECE_ID:i[0], 
-                GS.ACTION_TYPE:i[1][0]} for i in actions.items()]
-
-            act_msg[GS.DATA][GS.MOVEMENT_SELECTIONS] = movement_selections
+            act_data[GS.MOVEMENT_SELECTIONS] = [{
+                pid:tok, 
+                act:a[0]} for tok, a in actions.items()]
 
         return act_msg
 
@@ -71,13 +67,10 @@ def format_response_message(
             rep_msg (dict): API-compatible response message containing game state
         '''
 
-        rep_msg = dict()
-        rep_msg[GS.API_VERSION] = CUR_API_VERSION
+        rep_msg = _BASE_MSG.copy()
         rep_msg[GS.CONTEXT] = context
-        rep_msg['gameID'] = id(game)
-        rep_msg[GS.DATA] = dict()
-        rep_msg[GS.DATA][GS.KIND] = data_kind
-        rep_msg[GS.DATA][GS.GAME_STATE] = get_game_state(game.game_state, game.token_catalog)
+        rep_msg[GS.GAME_ID] = id(game)
+        rep_msg[GS.DATA] = {GS.KIND: data_kind, GS.GAME_STATE: get_game_state(game.game_state, game.token_catalog)}
         if data_kind == GS.ENGAGE_PHASE_RESP:
             
             engagement_outcomes = [{
@@ -104,30 +97,20 @@ def get_game_state(koth_game_state, koth_token_catalog):
         game_state[GS.GOAL_BETA] = koth_game_state[U.GOAL2]
         game_state[GS.SCORE_ALPHA] = koth_game_state[U.P1][U.SCORE]
         game_state[GS.SCORE_BETA] = koth_game_state[U.P2][U.SCORE]
+        # bind field names locally and select the legal action encoding once 
+        # for all tokens, instead of once per token
+        pid, fuel, role, pos, ammo, la = \
+            GS.PIECE_ID, GS.FUEL, GS.ROLE, GS.POSITION, GS.AMMO, GS.LEGAL_ACTIONS
+        fmt_legal_actions = GS.get_legal_action_formatter(koth_game_state[U.TURN_PHASE])
+        koth_legal_actions = koth_game_state[U.LEGAL_ACTIONS]
+
         game_state[GS.TOKEN_STATES] = [{
-            GS.PIECE_ID:token_name,
-            GS.FUEL:token_state.satellite.fuel,
-            GS.ROLE:token_state.role,
-            GS.POSITION:token_state.position,
-            GS.AMMO:token_state.satellite.ammo,
-            GS.LEGAL_ACTIONS:get_token_legal_actions(koth_game_state, token_name=token_name)
+            pid:token_name,
+            fuel:token_state.satellite.fuel,
+            role:token_state.role,
+            pos:token_state.position,
+            ammo:token_state.satellite.ammo,
+            la:fmt_legal_actions(koth_legal_actions[token_name])
             } for token_name, token_state in koth_token_catalog.items()]
 
         return game_state
-
-def get_token_legal_actions(koth_game_state, token_name):
-        ''' get list of dictionaries of legal actions from game state'''
-        legal_actions = None
-        if koth_game_state[U.TURN_PHASE] == U.MOVEMENT:
-            legal_actions = [{
-                GS.ACTION_TYPE:i.action_type} for i in koth_game_state[U.LEGAL_ACTIONS][token_name]]
-        elif koth_game_state[U.TURN_PHASE] == U.ENGAGEMENT:
-            legal_actions = [{
-                GS.ACTION_TYPE:i.action_type, 
-                GS.TARGET_ID:i.target} for i in koth_game_state[U.LEGAL_ACTIONS][token_name]]
-        elif koth_game_state[U.TURN_PHASE] == U.DRIFT:
-            legal_actions = []
-        else:
-            raise ValueError("Unrecognized turn phase {}".format(koth_game_state[U.TURN_PHASE]))
-
-        return legal_actions
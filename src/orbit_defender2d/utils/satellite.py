@@ -5,6 +5,8 @@
 # Definitions for satellite objects that act playing pieces in orbit grid
 
 class Satellite:
+    __slots__ = ('fuel', 'ammo')
+
     def __init__(self, fuel:float, ammo:int):
         '''
         Args:
@@ -2,6 +2,7 @@
 # Subject to FAR 52.227-11 – Patent Rights – Ownership by the Contractor (May 2014).
 # SPDX-License-Identifier: MIT
 
+import os
 import zmq
 import pytest
 import uuid
@@ -180,6 +181,40 @@ def test_TwoPlayerGameServer_echo_request(two_player_game_server_fixture):
     # ~~~ ASSERT ~~~
     assert rep_msg == ECHO_REQ_MSG_0
 
+@pytest.mark.skipif(os.name == 'nt', reason="ipc transport not available on Windows")
+def test_TwoPlayerGameServer_echo_request_ipc(request):
+    """Tests that two-player server can be reached on explicit ipc endpoints instead of tcp ports"""
+
+    # ~~~ ARRANGE ~~~
+    # start the python-unity server bound only to ipc endpoints
+    router_addr = "ipc:///tmp/od2d_test_router.sock"
+    game_server = TwoPlayerGameServer(
+        game=None,
+        comm_configs={
+            GS.ROUTER_ADDR: router_addr,
+            GS.PUB_ADDR: "ipc:///tmp/od2d_test_pub.sock"
+        }
+    )
+    game_server.start()
+
+    # Terminate the process when done with the test
+    def terminate():
+        game_server.terminate()
+        game_server.join()
+    request.addfinalizer(terminate)
+
+    # create a client and connect to matching endpoint
+    context = zmq.Context()
+    req_sock = ErrorCatchingSocket(context, zmq.REQ)
+    req_sock.connect(router_addr)
+
+    # ~~~ ACT ~~~
+    req_sock.send_json(ECHO_REQ_MSG_0)
+    rep_msg = req_sock.recv_json()
+
+    # ~~~ ASSERT ~~~
+    assert rep_msg == ECHO_REQ_MSG_0
+
 def test_TwoPlayerGameServer_handle_invalid_api(two_player_game_server_fixture):
     """ test that invalid api version returns error message
     """
@@ -821,6 +856,27 @@ def test_SingleUserGameServer_handle_drift_request(single_user_game_server_fixtu
     assert rep_msg['data']['gameState']['turnPhase'] == U.MOVEMENT
 
 
+def test_pub_topic_is_published_message_prefix():
+    """ test that published messages begin with the subscription topic for their context"""
+    game = koth.KOTHGame(**DEFAULT_PARAMS)
+    game_server = TwoPlayerGameServer(
+        game=game, 
+        comm_configs={ROUTER_PORT: ROUTER_PORT_NUM, PUB_PORT: PUB_PORT_NUM})
+
+    for context in [GS.PLAYER_REGISTRATION, GS.MOVE_PHASE, GS.ENGAGE_PHASE, GS.DRIFT_PHASE]:
+        pub_msg = game_server.format_game_state_response_message(
+            req_msg={GS.API_VERSION: API_VER_NUM_2P, GS.CONTEXT: context},
+            api_version=GS.CUR_2P_API_VERSION,
+            data_kind=GS.GAME_RESET_RESP,
+            game_state=game_server.get_game_state(),
+            engagement_outcomes=None,
+            is_2player=True)
+        raw_msg = GS.encode_message(pub_msg)
+        assert raw_msg.startswith(GS.pub_topic(API_VER_NUM_2P, context))
+        for other_context in GS.MSG_CONTEXTS:
+            if other_context != context:
+                assert not raw_msg.startswith(GS.pub_topic(API_VER_NUM_2P, other_context))
+
 def test_game_id(single_user_game_server_fixture):
     ''' check memory address of game object for multiprocessing'''
     
@@ -459,6 +459,37 @@ def test_KOTHGame_apply_verbose_actions_drift_0():
     assert game.game_state[U.P1][U.SCORE] == DEFAULT_PARAMS_PARTIAL['in_goal_points'][U.P1] + fuel_points_p1
     assert game.game_state[U.P2][U.SCORE] == DEFAULT_PARAMS_PARTIAL['in_goal_points'][U.P2] + fuel_points_p2
 
+def test_RandomValidActionSampler():
+    game = koth.KOTHGame(
+        max_ring=5, 
+        min_ring=1, 
+        geo_ring=4,
+        init_board_pattern_p1=INIT_BOARD_PATTERN_0,
+        init_board_pattern_p2=INIT_BOARD_PATTERN_0,
+        **DEFAULT_PARAMS_PARTIAL)
+    sampler = koth.RandomValidActionSampler(game)
+    while not game.game_state[U.GAME_DONE]:
+        actions = sampler.sample()
+        if game.game_state[U.TURN_PHASE] == U.DRIFT:
+            assert actions is None
+        else:
+            legal_actions = game.game_state[U.LEGAL_ACTIONS]
+            assert actions.keys() == legal_actions.keys()
+            illegal_actions, _, _ = koth.get_illegal_verbose_actions(actions, legal_actions)
+            assert not illegal_actions
+        game.apply_verbose_actions(actions)
+
+def test_KOTHGame_from_args():
+    args = koth.KOTHGameInputArgs(
+        max_ring=5, 
+        min_ring=1, 
+        geo_ring=4,
+        init_board_pattern_p1=INIT_BOARD_PATTERN_0,
+        init_board_pattern_p2=INIT_BOARD_PATTERN_0,
+        **DEFAULT_PARAMS_PARTIAL)
+    game = koth.KOTHGame.from_args(args)
+    assert game.inargs == args
+
 @pytest.mark.parametrize(
     "engagements", [
         (ENGAGE_0)
@@ -1017,6 +1017,35 @@ def test_parallel_env_step():
                 penv.kothgame.game_state[U.P2][U.SCORE])
             break
 
+def test_parallel_env_step_native():
+    '''check that stepping verbose random valid actions matches stepping encoded actions'''
+
+    # ~~~ ARRANGE ~~~
+    # create one env stepped with verbose actions and one with encoded actions
+    penv_native = PZE.parallel_env()
+    penv_native.reset()
+    penv_encoded = PZE.parallel_env()
+    penv_encoded.reset()
+
+    for trial_i in range(128):
+
+        # ~~~ ACT ~~~
+        # seed identically so both envs resolve engagements the same way
+        ver_act = penv_native.kothgame.get_random_valid_actions()
+        np.random.seed(trial_i)
+        obs_n, rew_n, dones_n, _ = penv_native.step_native(ver_act)
+        np.random.seed(trial_i)
+        obs_e, rew_e, dones_e, _ = penv_encoded.step(actions=penv_encoded.encode_all_discrete_actions(ver_act))
+
+        # ~~~ ASSERT ~~~
+        check_all_encoded_observations(obs_n, penv_native.kothgame)
+        assert rew_n == rew_e
+        assert dones_n == dones_e
+        for ag_id in penv_native.agents:
+            assert np.array_equal(obs_n[ag_id]['observation'], obs_e[ag_id]['observation'])
+        if dones_n[U.P1]:
+            break
+
 
 if __name__ == "__main__":
     # test_KOTHActionSpaces_init()